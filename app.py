@@ -1,11 +1,9 @@
 import streamlit as st
-from PIL import Image
-import requests
-import json
 from datetime import datetime
-import io
-import base64
-import numpy as np
+
+import metrics
+from scan_history import SCAN_HISTORY, TREND_DAYS
+from user_profile import daily_calorie_target
 
 # Page config
 st.set_page_config(
@@ -48,6 +46,26 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner="🤖 Loading the recognition engine...")
+def get_engine():
+    """
+    One warm ScanEngine per process, shared by every session. Imported
+    lazily so the first page render skips NumPy, PIL and the indexes.
+    """
+    from engine import ScanEngine
+    return ScanEngine()
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """
+    Serve Prometheus /metrics once per process when metrics are enabled
+    """
+    try:
+        return metrics.start_http_server()
+    except OSError as e:
+        print(f"Metrics endpoint error: {e}")
+        return None
+
 # Header
 st.markdown('<div class="main-header">🍽️ FoodScan AI</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-header">Scan Any Food & Know Your Nutrition Instantly</div>', unsafe_allow_html=True)
@@ -55,6 +73,8 @@ st.markdown('<div class="sub-header">Scan Any Food & Know Your Nutrition Instant
 # Sidebar for user preferences
 with st.sidebar:
     st.header("⚙️ Your Profile")
+    # History and trends are kept per profile name
+    history_user = st.text_input("Profile Name", value="Me").strip().lower() or "me"
     user_weight = st.number_input("Current Weight (kg)", min_value=30.0, max_value=200.0, value=70.0)
     user_goal = st.selectbox("Goal", ["Maintain Weight", "Lose Weight", "Gain Weight"])
     activity_level = st.selectbox("Activity Level", ["Sedentary", "Moderate", "Active"])
@@ -77,10 +97,68 @@ with st.sidebar:
 
     st.markdown(f"### {meal_emoji} {meal_time} Time")
 
+    st.divider()
+    st.header("📅 Today's Intake")
+    calorie_target = daily_calorie_target(user_weight, user_goal, activity_level)
+
+    # Totals live in the session and are only updated when items change
+    intake = st.session_state.get('daily_intake')
+    if intake is not None and not intake.is_current():
+        intake = None
+        del st.session_state['daily_intake']
+
+    if intake is None:
+        st.metric("Calories", f"0 / {calorie_target} kcal")
+        st.caption("Nothing logged yet today.")
+    else:
+        intake.calorie_target = calorie_target
+        st.metric("Calories", f"{intake.calories:.0f} / {calorie_target} kcal",
+                  f"{intake.remaining_calories:.0f} kcal left", delta_color="off")
+        st.progress(min(intake.progress, 1.0))
+        intake_totals = intake.totals
+        st.caption(f"Protein {intake_totals['protein']:.1f} g · Carbs {intake_totals['carbs']:.1f} g · "
+                   f"Fat {intake_totals['fat']:.1f} g")
+
+        for i, item in enumerate(intake.items):
+            item_col, remove_col = st.columns([4, 1])
+            with item_col:
+                st.write(f"{item['food_name'].title()} × {item['portion']:g} ({item['macros']['calories']:.0f} kcal)")
+            with remove_col:
+                if st.button("✖", key=f"remove_intake_{i}"):
+                    removed = intake.remove_item(i)
+                    # Take a mistaken log back out of the saved history too
+                    if removed.get('history'):
+                        SCAN_HISTORY.remove(*removed['history'])
+                    st.rerun()
+
+    st.divider()
+    st.header(f"📈 {TREND_DAYS}-Day Trend")
+    # Read from the per-day rollup: at most TREND_DAYS rows
+    trend_days, trend_calories = SCAN_HISTORY.trend(history_user)
+    if any(trend_calories):
+        st.line_chart({"kcal": trend_calories})
+        logged_days = sum(1 for calories in trend_calories if calories)
+        st.caption(f"{trend_days[0]:%d %b} – {trend_days[-1]:%d %b} · "
+                   f"{sum(trend_calories) / logged_days:.0f} kcal average on {logged_days} logged days")
+    else:
+        st.caption("Logged meals will show up here.")
+
     st.divider()
     st.header("ℹ️ About")
     st.info("This app uses advanced AI to identify food and provide accurate nutritional information.")
 
+    if metrics.ENABLED:
+        metrics_server = start_metrics_endpoint()
+        with st.expander("📈 Debug Metrics"):
+            snapshot = metrics.REGISTRY.snapshot()
+            if snapshot['stages']:
+                st.table([{'stage': name, **values} for name, values in snapshot['stages'].items()])
+            else:
+                st.caption("No stages timed yet.")
+            st.json(snapshot['counters'])
+            if metrics_server is not None:
+                st.caption(f"Prometheus: http://localhost:{metrics_server.server_address[1]}/metrics")
+
 # Main content area
 col1, col2 = st.columns([1, 1])
 
@@ -104,17 +182,26 @@ with col1:
     if uploaded_file is not None:
         # Load and validate image
         try:
-            image = Image.open(uploaded_file)
+            engine = get_engine()
+
+            # Identical uploads (retries, reruns) are keyed by their raw bytes
+            image_bytes = uploaded_file.getvalue()
+            cache_key = engine.content_key(image_bytes)
+            cached = engine.result_cache.get(cache_key)
 
             # Display image
-            st.image(image, caption="Your Food", use_container_width=True)
+            st.image(image_bytes, caption="Your Food", use_container_width=True)
 
-            # Image validation
-            img_array = np.array(image)
+            if cached is None:
+                # Decode near analysis size and screen once for every check below
+                frame = engine.decode(image_bytes)
+                screening = engine.screen(frame)
+                brightness = screening['features'].brightness
+            else:
+                # Cache hit: nothing below needs the decoded image
+                brightness = cached['brightness']
 
             # Check if image is too dark or too bright
-            brightness = img_array.mean()
-
             if brightness < 20:
                 st.warning("⚠️ Image is too dark. Try taking photo in better lighting.")
             elif brightness > 250:
@@ -123,33 +210,32 @@ with col1:
             # Analyze button
             if st.button("🔍 Analyze Food", type="primary", use_container_width=True):
                 with st.spinner("🤖 AI is analyzing your food..."):
-                    # Import modules
-                    from food_recognition import recognize_food_advanced, validate_food_image
-                    from nutrition_api import get_nutrition_data
-                    from recommendations import get_meal_recommendation
+                    if cached is None:
+                        # Validate, recognize and look up nutrition in one pass
+                        cached = engine.analyze(frame, cache_key, screening)
 
-                    # Validate if image contains food
-                    is_food, confidence = validate_food_image(image)
+                    is_food, confidence = cached['validation']
 
                     if not is_food:
                         st.error("❌ This doesn't appear to be a food image. Please upload a photo of actual food.")
                         st.stop()
 
-                    # Get food recognition result
-                    food_result = recognize_food_advanced(image)
+                    food_result = cached['result']
                     food_name = food_result['name']
                     detection_confidence = food_result['confidence']
 
                     # Show confidence
-                    if detection_confidence < 0.6:
+                    from engine import LOW_CONFIDENCE_THRESHOLD
+                    if detection_confidence < LOW_CONFIDENCE_THRESHOLD:
                         st.warning(f"⚠️ Low confidence detection ({detection_confidence*100:.1f}%). Results may not be accurate.")
 
-                    # Get nutrition data
-                    nutrition_data = get_nutrition_data(food_name)
+                    nutrition_data = cached['nutrition']
 
                     # Store in session state
                     st.session_state['food_name'] = food_name
                     st.session_state['nutrition_data'] = nutrition_data
+                    st.session_state['nutrition_match'] = cached.get('nutrition_match')
+                    st.session_state['plate'] = cached.get('plate')
                     st.session_state['confidence'] = detection_confidence
                     st.session_state['analyzed'] = True
                     st.rerun()
@@ -174,21 +260,31 @@ with col2:
         st.markdown("### Nutritional Information")
         st.caption(f"Serving size: {nutrition_data.get('serving_size', 'N/A')}")
 
+        # Say when the numbers come from a fuzzy name match or the defaults
+        nutrition_match = st.session_state.get('nutrition_match')
+        if nutrition_match and nutrition_match['method'] == 'fuzzy':
+            st.caption(f"Nutrition matched to **{nutrition_match['matched_name'].title()}** "
+                       f"({nutrition_match['score']*100:.0f}% name similarity)")
+        elif nutrition_match and nutrition_match['method'] == 'provider':
+            st.caption("Nutrition from the online food database.")
+        elif nutrition_match and nutrition_match['method'] == 'default':
+            st.caption("No nutrition record for this food; showing typical values.")
+
         col_a, col_b, col_c = st.columns(3)
         with col_a:
-            st.metric("Calories", f"{nutrition_data['calories']} kcal")
+            st.metric("Calories", f"{nutrition_data['calories']:g} kcal")
         with col_b:
-            st.metric("Protein", f"{nutrition_data['protein']} g")
+            st.metric("Protein", f"{nutrition_data['protein']:g} g")
         with col_c:
-            st.metric("Carbs", f"{nutrition_data['carbs']} g")
+            st.metric("Carbs", f"{nutrition_data['carbs']:g} g")
 
         col_d, col_e, col_f = st.columns(3)
         with col_d:
-            st.metric("Fat", f"{nutrition_data['fat']} g")
+            st.metric("Fat", f"{nutrition_data['fat']:g} g")
         with col_e:
-            st.metric("Fiber", f"{nutrition_data['fiber']} g")
+            st.metric("Fiber", f"{nutrition_data['fiber']:g} g")
         with col_f:
-            st.metric("Sugar", f"{nutrition_data['sugar']} g")
+            st.metric("Sugar", f"{nutrition_data['sugar']:g} g")
 
         # Weight gain/loss estimate
         st.markdown("### ⚖️ Weight Impact")
@@ -197,15 +293,54 @@ with col2:
         weight_change = calories / 7700
 
         if user_goal == "Lose Weight":
-            calorie_target = 1800
             if calories > calorie_target * 0.3:
-                st.warning(f"⚠️ This meal has {calories} kcal. Consider a lighter option for weight loss.")
+                st.warning(f"⚠️ This meal has {calories:g} kcal. Consider a lighter option for weight loss.")
             else:
                 st.success(f"✅ Good choice! This aligns with your weight loss goal.")
         elif user_goal == "Gain Weight":
             st.info(f"📈 Eating this will provide {weight_change:.4f} kg worth of calories.")
         else:
-            st.info(f"This meal contains {calories} kcal, contributing {weight_change:.4f} kg to weight if fully stored.")
+            st.info(f"This meal contains {calories:g} kcal, contributing {weight_change:.4f} kg to weight if fully stored.")
+
+        # Log the meal against today's target
+        log_col, portion_col = st.columns([2, 1])
+        with portion_col:
+            portion = st.number_input("Portions", min_value=0.25, max_value=5.0, value=1.0, step=0.25)
+        with log_col:
+            if st.button("➕ Add to Today's Log", use_container_width=True):
+                if intake is None:
+                    intake = get_engine().daily_intake(calorie_target)
+                    st.session_state['daily_intake'] = intake
+                item = intake.add_item(food_name, portion)
+                scanned_at = SCAN_HISTORY.record(history_user, food_name, item['macros'], portion,
+                                                 (nutrition_match or {}).get('food_id'), confidence)
+                item['history'] = scanned_at and (history_user, scanned_at)
+                st.rerun()
+        eaten_today = intake.calories if intake is not None else 0
+        st.caption(f"Today: {eaten_today:.0f} of {calorie_target} kcal eaten.")
+
+        # Mixed plates: every dish found, with servings and combined macros
+        plate = st.session_state.get('plate')
+        if plate and len(plate['regions']) > 1:
+            st.markdown("### 🍱 Plate Breakdown")
+            for region in plate['regions']:
+                st.write(f"• **{region['name'].title()}**: {region['area']*100:.0f}% of plate, "
+                         f"~{region['portion']:.1f} serving(s)")
+            plate_totals = plate['totals']
+            st.info(f"Whole plate: {plate_totals['calories']:.0f} kcal, "
+                    f"{plate_totals['protein']:.1f} g protein, {plate_totals['carbs']:.1f} g carbs, "
+                    f"{plate_totals['fat']:.1f} g fat")
+            if st.button("➕ Add Whole Plate to Today's Log", use_container_width=True):
+                if intake is None:
+                    intake = get_engine().daily_intake(calorie_target)
+                    st.session_state['daily_intake'] = intake
+                items = intake.add_plate([(region['name'], region['portion']) for region in plate['regions']])
+                for region, item in zip(plate['regions'], items):
+                    scanned_at = SCAN_HISTORY.record(
+                        history_user, item['food_name'], item['macros'], item['portion'],
+                        get_engine().lookup_food(region['name'])['food_id'], region['confidence'])
+                    item['history'] = scanned_at and (history_user, scanned_at)
+                st.rerun()
 
         # Vitamins and minerals
         st.markdown("### 💊 Vitamins & Minerals")
@@ -225,8 +360,10 @@ with col2:
         st.markdown("---")
         st.markdown("### 🤖 AI Recommendations")
 
-        from recommendations import get_meal_recommendation
-        recommendations = get_meal_recommendation(
+        # Reruns reuse this session's memoized answer
+        if 'recommendation_memo' not in st.session_state:
+            st.session_state['recommendation_memo'] = get_engine().recommendation_memo()
+        recommendations = st.session_state['recommendation_memo'].get(
             meal_time=meal_time,
             current_food=food_name,
             user_goal=user_goal,
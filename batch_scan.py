@@ -0,0 +1,158 @@
+"""
+Batch Scan CLI
+Recognizes whole photo archives in a process pool and streams JSONL results
+
+    python batch_scan.py photos/ "more/**/*.jpg" -o results.jsonl --resume
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from food_recognition import recognize_food_batch
+from image_preprocessing import DECODE_ERRORS, load_analysis_frame
+from nutrition_api import get_nutrition_data, lookup_food
+from nutrition_record import json_default
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+# Seconds between progress lines on stderr
+PROGRESS_INTERVAL = 5.0
+
+def iter_image_paths(inputs):
+    """
+    Expand directories (recursively), glob patterns and plain files into
+    image paths, lazily and in a stable order
+    """
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif glob.has_magic(item):
+            for path in sorted(glob.iglob(item, recursive=True)):
+                if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                    yield path
+        else:
+            yield item
+
+def _chunks(paths, size):
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def scan_chunk(paths):
+    """
+    Decode and recognize one chunk of images (runs in a worker process)
+    Returns one JSON-ready record per path, in order
+    """
+    frames, decoded, records = [], [], []
+    for path in paths:
+        try:
+            frames.append(load_analysis_frame(path))
+            decoded.append(len(records))
+            records.append({'path': path})
+        except DECODE_ERRORS as e:
+            records.append({'path': path, 'error': f"{type(e).__name__}: {e}"})
+
+    for i, result in zip(decoded, recognize_food_batch(frames)):
+        match = lookup_food(result['name'])
+        records[i].update({
+            'food': result['name'],
+            'confidence': result['confidence'],
+            'alternatives': result['alternatives'],
+            'nutrition_match': match['matched_name'],
+            'nutrition': get_nutrition_data(result['name'], match)
+        })
+    return records
+
+def load_completed(output_path):
+    """
+    Paths already recorded in a partial output file. A torn last line from
+    an interrupted run is cut off so appending starts on a clean line.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            done.add(json.loads(line)['path'])
+        except (ValueError, KeyError):
+            continue
+    return done
+
+def run(inputs, output_path, workers=None, chunk_size=32, resume=False, log=sys.stderr):
+    """
+    Scan every image under inputs into output_path; returns (scanned, seconds)
+    """
+    done = load_completed(output_path) if resume else set()
+    paths = (path for path in iter_image_paths(inputs) if path not in done)
+    chunks = _chunks(paths, chunk_size)
+    workers = workers or os.cpu_count() or 1
+
+    scanned = 0
+    started = last_report = time.perf_counter()
+    with open(output_path, 'a' if resume else 'w', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        # Two chunks per worker queued, so a worker starts its next chunk as
+        # soon as one finishes. Each chunk is decoded, then analyzed, in one
+        # process; decoding overlaps analysis only across workers.
+        pending = set()
+        for chunk in chunks:
+            pending.add(pool.submit(scan_chunk, chunk))
+            if len(pending) >= workers * 2:
+                break
+
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for record in future.result():
+                    out.write(json.dumps(record, default=json_default) + '\n')
+                    scanned += 1
+                out.flush()
+
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    pending.add(pool.submit(scan_chunk, chunk))
+
+            now = time.perf_counter()
+            if log and now - last_report >= PROGRESS_INTERVAL:
+                print(f"{scanned} images, {scanned / (now - started):.1f} images/sec", file=log)
+                last_report = now
+
+    elapsed = time.perf_counter() - started
+    if log:
+        rate = scanned / elapsed if elapsed else 0.0
+        skipped = f", {len(done)} skipped from previous run" if done else ""
+        print(f"Done: {scanned} images in {elapsed:.1f}s ({rate:.1f} images/sec){skipped}", file=log)
+    return scanned, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recognize food photos in bulk and stream JSONL results")
+    parser.add_argument('inputs', nargs='+', help="image files, directories or glob patterns")
+    parser.add_argument('-o', '--output', required=True, help="JSONL file to write")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--chunk-size', type=int, default=32, help="images per worker task")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip images already in the output file and append to it")
+    args = parser.parse_args(argv)
+    run(args.inputs, args.output, args.workers, args.chunk_size, args.resume)
+
+if __name__ == '__main__':
+    main()
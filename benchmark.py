@@ -0,0 +1,216 @@
+"""
+Pipeline Benchmarks
+Times every pipeline stage on synthetic images and checks for regressions
+
+    python benchmark.py --save-baseline            # record a baseline
+    python benchmark.py --threshold 0.2            # fail if >20% slower
+
+Reports p50/p95/p99 latency, throughput and peak traced memory per stage.
+Exit status is 1 when any stage regresses past the threshold.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from food_recognition import (INDIAN_FOOD_DATABASE, analyze_image_features,
+                              match_food_by_features, recognize_food_advanced,
+                              recognize_plate, validate_food_image)
+from image_preprocessing import load_analysis_frame
+from nutrition_api import _local_match, get_nutrition_data
+from recommendations import get_meal_recommendation
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+# Growth below these is noise, not a regression: microsecond stages move
+# by more than any relative threshold from scheduling alone
+MIN_REGRESSION = {'p50_ms': 0.05, 'peak_bytes': 4096}
+
+# Upload sizes to exercise: webcam, full HD, 12MP phone photo
+IMAGE_SIZES = [(640, 480), (1920, 1080), (4032, 3024)]
+
+# Names that hit canonical IDs and aliases, fuzzy matches and the default,
+# timed as separate stages so a slower fuzzy path isn't hidden by the
+# microsecond exact hits around it
+LOOKUP_KINDS = {
+    'exact': ["rice", "chawal", "masala dosa"],
+    'fuzzy': ["biriyani", "paneer makhni"],
+    'unknown': ["tomato soup"],
+}
+LOOKUP_NAMES = [name for names in LOOKUP_KINDS.values() for name in names]
+
+def synthetic_images(width, height, count=4, seed=0):
+    """
+    Deterministic JPEG uploads of one size, cycling through the catalogue
+    color profiles, with per-image texture so edges and spread are realistic
+    """
+    rng = np.random.default_rng(seed)
+    profiles = [food['color_profile'] for food in INDIAN_FOOD_DATABASE.values()]
+    images = []
+    for i in range(count):
+        # Texture is generated small and upscaled to keep setup fast
+        noise = rng.normal(0, 25, (height // 8, width // 8, 3))
+        small = np.clip(np.array(profiles[(i + seed) % len(profiles)]) + noise, 0, 255).astype(np.uint8)
+        image = Image.fromarray(small).resize((width, height))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=90)
+        images.append({'jpeg': buffer.getvalue(), 'image': image})
+    return images
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def measure(func, inputs, iterations, warmup=2):
+    """
+    Time func over inputs; returns latency percentiles (ms), throughput
+    (calls/sec) and peak traced memory (bytes) from a separate pass
+    """
+    for i in range(warmup):
+        func(inputs[i % len(inputs)])
+
+    latencies = []
+    gc.collect()
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        func(inputs[i % len(inputs)])
+        latencies.append((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+
+    # Tracing slows calls down, so memory gets its own pass
+    tracemalloc.start()
+    for item in inputs[:min(len(inputs), 8)]:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': _percentile(latencies, 0.95),
+        'p99_ms': _percentile(latencies, 0.99),
+        'throughput': iterations / elapsed,
+        'peak_bytes': peak
+    }
+
+def _end_to_end(item):
+    frame = load_analysis_frame(io.BytesIO(item['jpeg']))
+    is_food, _ = validate_food_image(frame)
+    if not is_food:
+        return None
+    result = recognize_food_advanced(frame)
+    nutrition = get_nutrition_data(result['name'])
+    return get_meal_recommendation("Lunch", result['name'], "Lose Weight", nutrition)
+
+def _cold_nutrition_lookup(name):
+    # Without clearing, every pass after the first would time cache hits
+    # and never the exact, fuzzy or store resolution behind them
+    _local_match.cache_clear()
+    return get_nutrition_data(name)
+
+def run_suite(iterations=50, sizes=None, images_per_size=4):
+    """
+    Benchmark every stage; returns {stage: metrics}
+    """
+    results = {}
+    features = []
+    for width, height in sizes or IMAGE_SIZES:
+        size = f"{width}x{height}"
+        batch = synthetic_images(width, height, images_per_size, seed=len(features))
+        pil_images = [item['image'] for item in batch]
+        features += [analyze_image_features(image) for image in pil_images]
+
+        results[f"decode[{size}]"] = measure(
+            lambda item: load_analysis_frame(io.BytesIO(item['jpeg'])), batch, iterations)
+        results[f"validate_food_image[{size}]"] = measure(validate_food_image, pil_images, iterations)
+        results[f"analyze_image_features[{size}]"] = measure(analyze_image_features, pil_images, iterations)
+        results[f"recognize_food_advanced[{size}]"] = measure(recognize_food_advanced, pil_images, iterations)
+        results[f"recognize_plate[{size}]"] = measure(recognize_plate, pil_images, iterations)
+        results[f"end_to_end[{size}]"] = measure(_end_to_end, batch, iterations)
+
+    results["match_food_by_features"] = measure(match_food_by_features, features, iterations * 10)
+    for kind, names in LOOKUP_KINDS.items():
+        results[f"get_nutrition_data[{kind}]"] = measure(_cold_nutrition_lookup, names, iterations * 10)
+    results["get_nutrition_data[cached]"] = measure(get_nutrition_data, LOOKUP_NAMES, iterations * 10)
+    nutrition = [(name, get_nutrition_data(name)) for name in LOOKUP_NAMES]
+    results["get_meal_recommendation"] = measure(
+        lambda pair: get_meal_recommendation("Dinner", pair[0], "Lose Weight", pair[1]),
+        nutrition, iterations * 10)
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Stages whose p50 latency or peak memory grew by more than threshold,
+    and by more than the absolute floor in MIN_REGRESSION
+    Returns [(stage, metric, baseline_value, current_value)]
+    """
+    regressions = []
+    for stage, current in results.items():
+        previous = baseline.get(stage)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'peak_bytes'):
+            growth = current[metric] - previous[metric]
+            if (previous[metric] > 0 and growth > previous[metric] * threshold
+                    and growth > MIN_REGRESSION[metric]):
+                regressions.append((stage, metric, previous[metric], current[metric]))
+    return regressions
+
+def print_report(results, out=sys.stdout):
+    print(f"{'stage':<42}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ops/s':>10}{'peak KiB':>10}", file=out)
+    for stage, m in results.items():
+        print(f"{stage:<42}{m['p50_ms']:9.3f}{m['p95_ms']:9.3f}{m['p99_ms']:9.3f}"
+              f"{m['throughput']:10.1f}{m['peak_bytes'] / 1024:10.1f}", file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every ScanEat pipeline stage")
+    parser.add_argument('--iterations', type=int, default=50, help="timed calls per image stage")
+    parser.add_argument('--sizes', nargs='*', help="image sizes to test, e.g. 640x480 1920x1080")
+    parser.add_argument('--images-per-size', type=int, default=4, help="distinct images per size")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="write results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed relative growth of p50 latency and peak memory")
+    parser.add_argument('--json', help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = [tuple(int(v) for v in size.split('x')) for size in args.sizes] if args.sizes else None
+    results = run_suite(args.iterations, sizes, args.images_per_size)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for stage, metric, before, after in regressions:
+        print(f"REGRESSION {stage} {metric}: {before:.3f} -> {after:.3f} "
+              f"(+{(after / before - 1) * 100:.0f}%)")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold * 100:.0f}% against {args.baseline}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
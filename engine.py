@@ -0,0 +1,188 @@
+"""
+Scan Engine
+One warm, process-wide owner of the recognition, nutrition and
+recommendation indexes
+"""
+import importlib
+import io
+import time
+
+from metrics import count, timed
+
+# Recognition results below this confidence are flagged as unreliable
+LOW_CONFIDENCE_THRESHOLD = 0.6
+
+# Heavy modules in dependency order, so each import time is incremental
+ENGINE_MODULES = (
+    "numpy",
+    "PIL.Image",
+    "image_preprocessing",
+    "food_search",
+    "food_classifier",
+    "food_recognition",
+    "nutrition_api",
+    "recommendations",
+    "intake_tracker",
+    "scan_cache",
+)
+
+class ScanEngine:
+    """
+    Imports the pipeline once and keeps its precomputed state: the color
+    profile matrix and index, the trained classifier (if any), the
+    nutrition table, the food name index and the alternative index. It
+    holds no per-user state, so one instance per process can serve every
+    session.
+    """
+
+    def __init__(self):
+        started = time.perf_counter()
+        self.import_times = {}
+        modules = {}
+        for name in ENGINE_MODULES:
+            module_started = time.perf_counter()
+            modules[name] = importlib.import_module(name)
+            self.import_times[name] = time.perf_counter() - module_started
+        self.build_seconds = time.perf_counter() - started
+
+        self._preprocessing = modules["image_preprocessing"]
+        self._recognition = modules["food_recognition"]
+        self._nutrition = modules["nutrition_api"]
+        self._recommendations = modules["recommendations"]
+        self._intake = modules["intake_tracker"]
+        self._cache = modules["scan_cache"]
+
+        self.color_profiles = self._recognition.FOOD_COLOR_PROFILES
+        self.color_index = self._recognition.COLOR_INDEX
+        self.classifier = self._recognition.CLASSIFIER
+        self.nutrition_table = self._nutrition.NUTRITION_TABLE
+        self.name_index = self._nutrition.NAME_INDEX
+        self.alternative_index = self._recommendations.ALTERNATIVE_INDEX
+        self.result_cache = self._cache.RESULT_CACHE
+
+    def load_report(self):
+        """
+        Import time per module in milliseconds, slowest first
+        """
+        return sorted(((name, seconds * 1000) for name, seconds in self.import_times.items()),
+                      key=lambda item: item[1], reverse=True)
+
+    def content_key(self, image_bytes):
+        return self._cache.content_key(image_bytes)
+
+    def decode(self, image_bytes):
+        """
+        Decode raw upload bytes straight to the analysis buffer
+        """
+        return self._preprocessing.load_analysis_frame(io.BytesIO(image_bytes))
+
+    def extract_features(self, image):
+        """
+        ImageFeatures for raw upload bytes or an already decoded analysis buffer
+        """
+        if isinstance(image, (bytes, bytearray)):
+            image = self.decode(image)
+        return self._recognition.extract_image_features(image)
+
+    def validate(self, features):
+        return self._recognition.validate_food_image(features)
+
+    def screen(self, image):
+        """
+        Coarse-to-fine validation of upload bytes or an analysis buffer
+        Returns {'is_food', 'confidence', 'level', 'features'}
+        """
+        if isinstance(image, (bytes, bytearray)):
+            image = self.decode(image)
+        return self._recognition.validate_food_cascade(image)
+
+    def recognize(self, features):
+        return self._recognition.recognize_food_advanced(features)
+
+    def analyze_plate(self, frame):
+        """
+        Dishes found on a mixed plate with their servings and combined macros
+        Returns {'regions': [{'name', 'confidence', 'area', 'portion'}], 'totals'}
+        """
+        regions = self._recognition.recognize_plate(frame)
+        portions = self._intake.region_portions(regions)
+        for region, (_, portion) in zip(regions, portions):
+            region['portion'] = portion
+        return {'regions': regions, 'totals': self._intake.plate_totals(portions)}
+
+    @timed('analyze')
+    def analyze(self, frame, cache_key=None, screening=None):
+        """
+        Validate a decoded frame with the cascade, then recognize it, detect
+        plate regions and resolve nutrition. Pass screening when screen()
+        already ran on this frame. Rejected frames never pay for full
+        resolution features.
+        Returns the result cache entry, stored under cache_key when given.
+        """
+        screening = screening or self.screen(frame)
+        is_food = screening['is_food']
+        entry = {
+            'brightness': screening['features'].brightness,
+            'validation': [is_food, screening['confidence']],
+            'validation_level': screening['level'],
+            'result': None,
+            'nutrition': None,
+            'nutrition_match': None,
+            'plate': None
+        }
+
+        if not is_food:
+            count('not_food')
+        else:
+            features = screening['features']
+            if screening['level'] != self._preprocessing.ANALYSIS_SIZE[0]:
+                features = self.extract_features(frame)
+            entry['result'] = self.recognize(features)
+            if entry['result']['confidence'] < LOW_CONFIDENCE_THRESHOLD:
+                count('low_confidence')
+            name = entry['result']['name']
+            entry['nutrition_match'] = self._nutrition.lookup_food(name)
+            entry['nutrition'] = self._nutrition.get_nutrition_data(name, entry['nutrition_match'])
+            entry['plate'] = self.analyze_plate(frame)
+
+        if cache_key is not None:
+            self.result_cache.put(cache_key, entry)
+        return entry
+
+    def analyze_upload(self, image_bytes):
+        """
+        Full pipeline for raw upload bytes; cache hits skip decoding
+        """
+        cache_key = self.content_key(image_bytes)
+        entry = self.result_cache.get(cache_key)
+        if entry is None:
+            entry = self.analyze(self.decode(image_bytes), cache_key)
+        return entry
+
+    def lookup_food(self, food_name):
+        return self._nutrition.lookup_food(food_name)
+
+    def nutrition(self, food_name, match=None):
+        return self._nutrition.get_nutrition_data(food_name, match)
+
+    def recommend(self, meal_time, current_food, user_goal, nutrition_data, rng=None):
+        return self._recommendations.get_meal_recommendation(
+            meal_time, current_food, user_goal, nutrition_data, rng)
+
+    def recommendation_memo(self, seed=None):
+        """
+        A fresh per-session recommendation memo
+        """
+        return self._recommendations.RecommendationMemo(seed)
+
+    def daily_intake(self, calorie_target):
+        """
+        A fresh per-session daily intake log
+        """
+        return self._intake.DailyIntake(calorie_target)
+
+if __name__ == "__main__":
+    engine = ScanEngine()
+    print(f"Engine built in {engine.build_seconds * 1000:.1f} ms")
+    for name, ms in engine.load_report():
+        print(f"  {name:<22}{ms:8.1f} ms")
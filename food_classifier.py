@@ -0,0 +1,206 @@
+"""
+Prototype Food Classifier
+Nearest-prototype recognition trained from a folder of labeled photos
+
+    python food_classifier.py photos/ -o models/food_prototypes
+
+photos/ holds one sub-folder per dish (photos/masala dosa/*.jpg, ...).
+Training writes food_prototypes.npy, the prototype matrix, and
+food_prototypes.json, the labels and feature scaling. The .npy is
+memory-mapped read-only at load, so every worker process shares one
+page-cache copy. Adding dishes means retraining, not editing code.
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+# Loaded by food_recognition at import when present; SCANEAT_MODEL overrides
+DEFAULT_MODEL = os.environ.get(
+    'SCANEAT_MODEL',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'food_prototypes'))
+
+# Joint RGB color histogram with this many bins per channel
+HISTOGRAM_BINS = 4
+
+# Mean color, spread, two edge densities and the histogram
+FEATURE_SIZE = 6 + HISTOGRAM_BINS ** 3
+
+def color_histograms(stack):
+    """
+    Normalized joint RGB histograms of an N x H x W x 3 uint8 stack,
+    from one bincount over the whole stack. Returns N x HISTOGRAM_BINS**3
+    """
+    n, height, width, _ = stack.shape
+    bins = HISTOGRAM_BINS ** 3
+    quantized = stack >> (8 - (HISTOGRAM_BINS.bit_length() - 1))
+    cells = (quantized[..., 0].astype(np.int32) * HISTOGRAM_BINS + quantized[..., 1]) * HISTOGRAM_BINS
+    cells += quantized[..., 2]
+    cells += (np.arange(n, dtype=np.int32) * bins)[:, None, None]
+    counts = np.bincount(cells.ravel(), minlength=n * bins).reshape(n, bins)
+    return counts / (height * width)
+
+def feature_vectors(features):
+    """
+    Raw classifier inputs, one row per ImageFeatures carrying a histogram
+    """
+    vectors = np.empty((len(features), FEATURE_SIZE), dtype=np.float32)
+    for row, f in zip(vectors, features):
+        row[:3] = f.avg_color / 255
+        row[3:6] = f.std_dev / 128, f.edges_horizontal / 64, f.edges_vertical / 64
+        row[6:] = f.color_histogram
+    return vectors
+
+class PrototypeClassifier:
+    """
+    One prototype per dish: the mean standardized feature vector of its
+    training photos. Nearest-prototype search is a single matrix product,
+    since |z - p|^2 = |z|^2 - 2 (z.p - |p|^2 / 2) and |z|^2 is the same for
+    every class; each weight row is [p, -|p|^2 / 2] against [z, 1].
+    """
+
+    def __init__(self, weights, labels, feature_mean, feature_scale, temperature):
+        self.weights = weights
+        self.labels = labels
+        self.feature_mean = np.asarray(feature_mean, dtype=np.float32)
+        self.feature_scale = np.asarray(feature_scale, dtype=np.float32)
+        self.temperature = temperature
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL):
+        """
+        Map path.npy read-only and read path.json
+        """
+        with open(path + '.json', encoding='utf-8') as f:
+            meta = json.load(f)
+        weights = np.load(path + '.npy', mmap_mode='r')
+        if weights.shape != (len(meta['labels']), FEATURE_SIZE + 1):
+            raise ValueError(f"Model {path} has shape {weights.shape}, expected "
+                             f"({len(meta['labels'])}, {FEATURE_SIZE + 1})")
+        return cls(weights, meta['labels'], meta['feature_mean'], meta['feature_scale'],
+                   meta['temperature'])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.save(path + '.npy', np.ascontiguousarray(self.weights, dtype=np.float32))
+        with open(path + '.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'labels': self.labels,
+                'feature_mean': self.feature_mean.tolist(),
+                'feature_scale': self.feature_scale.tolist(),
+                'temperature': self.temperature
+            }, f, indent=1)
+
+    def predict(self, vectors, k=4):
+        """
+        Top k dishes for each row of raw feature vectors
+        Returns, per row, [(label, confidence)] best first. Confidence is a
+        softmax over negative squared distances to every prototype.
+        """
+        vectors = np.atleast_2d(vectors)
+        augmented = np.ones((len(vectors), FEATURE_SIZE + 1), dtype=np.float32)
+        augmented[:, :-1] = (vectors - self.feature_mean) / self.feature_scale
+        scores = augmented @ self.weights.T
+
+        # -|z - p|^2 / T up to a per-row constant, which softmax ignores
+        logits = scores * (2 / self.temperature)
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        k = min(k, len(self.labels))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < len(self.labels) \
+            else np.broadcast_to(np.arange(len(self.labels)), scores.shape)
+        predictions = []
+        for row, candidates in zip(probabilities, top):
+            ranked = candidates[np.argsort(-row[candidates], kind='stable')]
+            predictions.append([(self.labels[i], float(row[i])) for i in ranked])
+        return predictions
+
+def train(vectors, labels):
+    """
+    Fit a PrototypeClassifier to raw feature vectors and their dish labels
+    """
+    classes = sorted(set(labels))
+    index = {label: i for i, label in enumerate(classes)}
+    class_of = np.array([index[label] for label in labels])
+    vectors = np.asarray(vectors, dtype=np.float64)
+
+    feature_mean = vectors.mean(axis=0)
+    feature_scale = vectors.std(axis=0)
+    feature_scale[feature_scale < 1e-6] = 1.0
+    standardized = (vectors - feature_mean) / feature_scale
+
+    prototypes = np.zeros((len(classes), FEATURE_SIZE))
+    np.add.at(prototypes, class_of, standardized)
+    prototypes /= np.bincount(class_of, minlength=len(classes))[:, None]
+
+    # Softmax temperature: the typical squared distance to one's own prototype
+    spread = ((standardized - prototypes[class_of]) ** 2).sum(axis=1).mean()
+    weights = np.hstack([prototypes, -0.5 * (prototypes ** 2).sum(axis=1, keepdims=True)])
+    return PrototypeClassifier(weights.astype(np.float32), classes, feature_mean, feature_scale,
+                               float(max(spread, 1e-3)))
+
+def load_classifier(path=DEFAULT_MODEL):
+    """
+    The trained model at path, or None when there is none
+    """
+    if not os.path.exists(path + '.npy'):
+        return None
+    try:
+        return PrototypeClassifier.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Classifier load error: {e}")
+        return None
+
+def labeled_images(root):
+    """
+    (path, label) for every image under root, labeled by its top-level folder
+    """
+    from batch_scan import iter_image_paths
+
+    for name in sorted(os.listdir(root)):
+        folder = os.path.join(root, name)
+        if os.path.isdir(folder):
+            for path in iter_image_paths([folder]):
+                yield path, name.strip().lower()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the prototype food classifier from labeled photos")
+    parser.add_argument('photos', help="folder with one sub-folder of photos per dish")
+    parser.add_argument('-o', '--output', default=DEFAULT_MODEL, help="model path without extension")
+    args = parser.parse_args(argv)
+
+    from food_recognition import BATCH_CHUNK_SIZE, extract_batch_features
+    from image_preprocessing import DECODE_ERRORS, load_analysis_frame
+
+    # Only feature vectors are kept; frames are dropped chunk by chunk
+    chunks, frames, labels = [], [], []
+    for path, label in labeled_images(args.photos):
+        try:
+            frames.append(load_analysis_frame(path))
+            labels.append(label)
+        except DECODE_ERRORS as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+        if len(frames) == BATCH_CHUNK_SIZE:
+            chunks.append(feature_vectors(extract_batch_features(frames, histograms=True)))
+            frames = []
+    if frames:
+        chunks.append(feature_vectors(extract_batch_features(frames, histograms=True)))
+    if not labels:
+        print(f"No labeled images under {args.photos}", file=sys.stderr)
+        return 1
+
+    vectors = np.concatenate(chunks)
+    classifier = train(vectors, labels)
+    classifier.save(args.output)
+
+    hits = sum(top[0][0] == label for top, label in zip(classifier.predict(vectors, k=1), labels))
+    print(f"Trained {len(classifier.labels)} dishes on {len(labels)} photos "
+          f"({hits / len(labels) * 100:.1f}% training accuracy); saved to {args.output}.npy")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
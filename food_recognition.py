@@ -5,6 +5,11 @@ Uses multiple methods for accurate food detection
 from PIL import Image
 import numpy as np
 import io
+import threading
+
+from food_classifier import color_histograms, feature_vectors, load_classifier
+from image_preprocessing import ANALYSIS_SIZE, rgb_array
+from metrics import count, timed
 
 # Comprehensive Indian food database
 INDIAN_FOOD_DATABASE = {
@@ -70,40 +75,366 @@ INDIAN_FOOD_DATABASE = {
     },
 }
 
-def validate_food_image(image):
+# Catalogue color profiles as one contiguous matrix, row i <-> FOOD_KEYS[i]
+FOOD_KEYS = list(INDIAN_FOOD_DATABASE)
+FOOD_COLOR_PROFILES = np.ascontiguousarray(
+    [INDIAN_FOOD_DATABASE[key]['color_profile'] for key in FOOD_KEYS], dtype=np.float32)
+
+# Alternatives must be at least this similar to the image's mean color
+MIN_COLOR_SIMILARITY = 0.5
+
+# Catalogues larger than this are searched through a ColorGridIndex
+COLOR_INDEX_THRESHOLD = 2000
+
+class ColorGridIndex:
     """
-    Validate if the image actually contains food
-    Returns: (is_food: bool, confidence: float)
+    Uniform grid over RGB space for nearest-profile queries on large catalogues.
+    Distances are L1, matching the mean absolute color difference used for
+    similarity, and results are exact: cells are visited only while their
+    lower-bound distance can still beat the current k-th best.
     """
-    try:
-        img_array = np.array(image.resize((224, 224)))
 
-        # Check if image is too uniform
-        std_dev = img_array.std()
-        if std_dev < 15:
-            return False, 0.2
+    def __init__(self, profiles, cell_size=32):
+        self.profiles = profiles
+        grid = -(-256 // cell_size)
+        coords = np.clip(profiles // cell_size, 0, grid - 1).astype(np.int64)
+        cell_ids = (coords[:, 0] * grid + coords[:, 1]) * grid + coords[:, 2]
 
-        # Check color distribution
-        avg_color = img_array.mean(axis=(0, 1))
-        color_variance = np.std(avg_color)
+        # CSR layout: members of cell self.cells[i] are order[starts[i]:starts[i + 1]]
+        self.order = np.argsort(cell_ids, kind='stable')
+        self.cells, counts = np.unique(cell_ids, return_counts=True)
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+        corners = np.stack([self.cells // (grid * grid), (self.cells // grid) % grid,
+                            self.cells % grid], axis=1).astype(np.float32) * cell_size
+        self.low = corners
+        self.high = corners + cell_size
 
-        if color_variance < 5:
-            return False, 0.3
+    def query(self, color, k, max_distance=np.inf):
+        """
+        Indices of the k profiles nearest to color (L1), best first, within
+        max_distance. Returns (indices, distances).
+        """
+        color = np.asarray(color, dtype=np.float32)
+        bounds = (np.maximum(self.low - color, 0) + np.maximum(color - self.high, 0)).sum(axis=1)
+        visit = np.argsort(bounds, kind='stable')
 
-        # Check brightness
-        brightness = avg_color.mean()
-        if brightness < 20 or brightness > 250:
-            return True, 0.5
+        # Smallest prefix of cells that holds k profiles gives an upper bound
+        counts = np.cumsum(self.starts[visit + 1] - self.starts[visit])
+        prefix = int(min(np.searchsorted(counts, k), len(visit) - 1)) + 1
+        candidates = self._members(visit[:prefix])
+        distances = np.abs(self.profiles[candidates] - color).sum(axis=1)
+        kth = np.partition(distances, min(k, len(distances)) - 1)[min(k, len(distances)) - 1]
 
-        # Calculate edge density
-        gray = np.mean(img_array, axis=2)
-        edges = np.abs(gray[1:] - gray[:-1]).mean()
+        # Any cell whose box is closer than that bound may still contribute
+        radius = min(kth, max_distance)
+        candidates = self._members(visit[bounds[visit] <= radius])
+        distances = np.abs(self.profiles[candidates] - color).sum(axis=1)
+        keep = distances <= max_distance
+        candidates, distances = candidates[keep], distances[keep]
 
-        if edges < 5:
-            return False, 0.4
+        best = np.lexsort((candidates, distances))[:k]
+        return candidates[best], distances[best]
+
+    def _members(self, cells):
+        if len(cells) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[self.starts[c]:self.starts[c + 1]] for c in cells])
+
+def build_color_index(profiles=None):
+    """
+    Build a ColorGridIndex over catalogue profiles (all of them by default)
+    """
+    return ColorGridIndex(FOOD_COLOR_PROFILES if profiles is None else profiles)
+
+COLOR_INDEX = build_color_index() if len(FOOD_KEYS) > COLOR_INDEX_THRESHOLD else None
+
+@timed('color_matching')
+def find_color_matches(avg_colors, k=4):
+    """
+    Catalogue foods whose color profile best matches each mean color
+    Accepts one RGB color or an N x 3 array of them
+    Returns, per color, up to k (food_key, similarity) pairs, best first
+    """
+    avg_colors = np.asarray(avg_colors, dtype=np.float32)
+    single = avg_colors.ndim == 1
+    avg_colors = np.atleast_2d(avg_colors)
+
+    if COLOR_INDEX is not None:
+        # Similarity > MIN_COLOR_SIMILARITY <=> L1 distance below this bound
+        max_distance = (1 - MIN_COLOR_SIMILARITY) * 255 * 3
+        matches = []
+        for color in avg_colors:
+            indices, distances = COLOR_INDEX.query(color, k, max_distance)
+            similarity = 1 - (distances / 3) / 255
+            matches.append([(FOOD_KEYS[i], float(sim))
+                            for i, sim in zip(indices, similarity) if sim > MIN_COLOR_SIMILARITY])
+        return matches[0] if single else matches
+
+    # One broadcast gives every color against every profile
+    color_diff = np.abs(FOOD_COLOR_PROFILES[None, :, :] - avg_colors[:, None, :]).mean(axis=2)
+    similarity = np.maximum(0, 1 - (color_diff / 255))
+
+    k = min(k, len(FOOD_KEYS))
+    top = np.argpartition(-similarity, k - 1, axis=1)[:, :k] if k < len(FOOD_KEYS) \
+        else np.broadcast_to(np.arange(len(FOOD_KEYS)), similarity.shape)
+
+    matches = []
+    for row, candidates in zip(similarity, top):
+        # Ties keep catalogue order, like a stable sort would
+        ranked = candidates[np.lexsort((candidates, -row[candidates]))]
+        matches.append([(FOOD_KEYS[i], float(row[i]))
+                        for i in ranked if row[i] > MIN_COLOR_SIMILARITY])
+    return matches[0] if single else matches
+
+# Trained prototype model (see food_classifier.py); without one the
+# rule-based matcher recognizes food
+CLASSIFIER = load_classifier()
+
+class ImageFeatures:
+    """
+    Image statistics computed once per upload and shared by the
+    brightness check, the validator and the recognizer. color_histogram
+    is only computed when the prototype classifier needs it.
+    """
+    __slots__ = ('avg_color', 'brightness', 'std_dev', 'edges_horizontal',
+                 'edges_vertical', 'texture_score', 'color_histogram')
+
+    def __init__(self, avg_color, std_dev, edges_horizontal, edges_vertical, color_histogram=None):
+        self.avg_color = avg_color
+        self.brightness = avg_color.mean()
+        self.std_dev = std_dev
+        self.edges_horizontal = edges_horizontal
+        self.edges_vertical = edges_vertical
+        self.texture_score = (edges_horizontal + edges_vertical) / 2
+        self.color_histogram = color_histogram
+
+def _analysis_frame(image):
+    """
+    Canonical analysis buffer for a PIL image; a prepared buffer from
+    image_preprocessing is used as-is, without another copy
+    """
+    if isinstance(image, np.ndarray):
+        if image.dtype == np.uint8 and image.shape == (ANALYSIS_SIZE[1], ANALYSIS_SIZE[0], 3):
+            return image
+        image = Image.fromarray(image)
+    return rgb_array(image)
+
+@timed('feature_extraction')
+def extract_image_features(image):
+    """
+    Resize once and compute color, spread and edge statistics in a single pass.
+    Passing an ImageFeatures returns it unchanged.
+    """
+    if isinstance(image, ImageFeatures):
+        return image
 
-        confidence = min(0.95, 0.6 + (edges / 50) + (std_dev / 100))
-        return True, confidence
+    stack = _analysis_frame(image)[None]
+    stats = _frame_statistics(stack)
+    histogram = color_histograms(stack)[0] if CLASSIFIER is not None else None
+    return ImageFeatures(*(column[0] for column in stats), histogram)
+
+# Frames per kernel pass; bounds the size of each thread's workspace
+KERNEL_BLOCK = 8
+
+class _KernelWorkspace(threading.local):
+    """
+    Per-thread scratch buffers for _frame_statistics. They are allocated once
+    per frame size and reused, so concurrent sessions don't churn full-frame
+    temporaries through the allocator on every upload.
+    """
+
+    def __init__(self):
+        self.shape = None
+
+    def buffers(self, height, width):
+        if self.shape != (height, width):
+            self.squares = np.empty((KERNEL_BLOCK, height, width * 3), dtype=np.uint16)
+            self.row_sums = np.empty((KERNEL_BLOCK, width * 3), dtype=np.uint32)
+            self.gray = np.empty((KERNEL_BLOCK, height, width), dtype=np.int16)
+            self.diff_horizontal = np.empty((KERNEL_BLOCK, height, width - 1), dtype=np.int16)
+            self.diff_vertical = np.empty((KERNEL_BLOCK, height - 1, width), dtype=np.int16)
+            self.shape = (height, width)
+        return self
+
+_WORKSPACE = _KernelWorkspace()
+
+def _frame_statistics(stack):
+    """
+    Mean color, pixel spread and edge density for an N x H x W x 3 uint8 stack.
+    Sums are accumulated exactly in integers along contiguous rows, which is
+    much faster than float reductions over the small channel axis, and every
+    full-frame intermediate lives in the calling thread's reused workspace.
+    Returns (avg_colors, std_devs, edges_horizontal, edges_vertical)
+    """
+    n, height, width, _ = stack.shape
+    pixels = height * width
+    ws = _WORKSPACE.buffers(height, width)
+
+    channel_sums = np.empty((n, 3), dtype=np.uint64)
+    square_sums = np.empty(n, dtype=np.uint64)
+    edges_horizontal = np.empty(n, dtype=np.int64)
+    edges_vertical = np.empty(n, dtype=np.int64)
+
+    for start in range(0, n, KERNEL_BLOCK):
+        block = np.ascontiguousarray(stack[start:start + KERNEL_BLOCK])
+        frames = len(block)
+        done = slice(start, start + frames)
+        rows = block.reshape(frames, height, width * 3)
+        row_sums = ws.row_sums[:frames]
+
+        # Color sums and sums of squares, column-wise then per channel
+        rows.sum(axis=1, dtype=np.uint32, out=row_sums)
+        channel_sums[done] = row_sums.reshape(frames, width, 3).sum(axis=1)
+        squares = np.square(rows, dtype=np.uint16, out=ws.squares[:frames])
+        squares.sum(axis=1, dtype=np.uint32, out=row_sums)
+        square_sums[done] = row_sums.sum(axis=1)
+
+        # Grayscale kept as the channel sum (x3) so edges stay in integers
+        gray = np.add(block[..., 0], block[..., 1], dtype=np.int16, out=ws.gray[:frames])
+        gray += block[..., 2]
+        diff = np.subtract(gray[:, :, 1:], gray[:, :, :-1], out=ws.diff_horizontal[:frames])
+        edges_horizontal[done] = np.abs(diff, out=diff).sum(axis=(1, 2))
+        diff = np.subtract(gray[:, 1:], gray[:, :-1], out=ws.diff_vertical[:frames])
+        edges_vertical[done] = np.abs(diff, out=diff).sum(axis=(1, 2))
+
+    avg_colors = channel_sums / pixels
+
+    # Spread over every channel value, from sum and sum of squares
+    mean = channel_sums.sum(axis=1) / (pixels * 3)
+    std_devs = np.sqrt(np.maximum(square_sums / (pixels * 3) - mean ** 2, 0))
+
+    edges_horizontal = edges_horizontal / (3 * height * (width - 1))
+    edges_vertical = edges_vertical / (3 * (height - 1) * width)
+
+    return avg_colors, std_devs, edges_horizontal, edges_vertical
+
+# Validation cascade: sampled grids checked before the full frame, with the
+# relative margin an estimate must clear at each size to settle a rule
+CASCADE_LEVELS = ((32, 0.3), (64, 0.15))
+
+def _sampled_features(frame, size):
+    """
+    ImageFeatures estimated from a size x size grid of pixels and their
+    right and lower neighbours. Unlike a downscaled thumbnail this keeps
+    pixel-level spread and edge density. Grid steps vary by one pixel
+    (e.g. 3 and 4 on the 224 frame), so sampling doesn't alias with
+    periodic patterns such as JPEG blocks.
+    """
+    height, width, _ = frame.shape
+    ys = (np.arange(size) * height // size)[:, None]
+    xs = np.arange(size) * width // size
+    sample = frame[ys, xs]
+    right = frame[ys, xs + 1]
+    below = frame[ys + 1, xs]
+
+    values = sample.astype(np.float32).reshape(-1, 3)
+    gray = sample[..., 0].astype(np.int16) + sample[..., 1] + sample[..., 2]
+    gray_right = right[..., 0].astype(np.int16) + right[..., 1] + right[..., 2]
+    gray_below = below[..., 0].astype(np.int16) + below[..., 1] + below[..., 2]
+
+    return ImageFeatures(values.mean(axis=0), values.std(),
+                         np.abs(gray_right - gray).mean() / 3, np.abs(gray_below - gray).mean() / 3)
+
+def _below(value, threshold, margin):
+    """
+    Whether value < threshold, or None when it is within margin of it
+    """
+    if value < threshold * (1 - margin):
+        return True
+    if value >= threshold * (1 + margin):
+        return False
+    return None
+
+def _above(value, threshold, margin):
+    """
+    Whether value > threshold, or None when it is within margin of it
+    """
+    if value > threshold * (1 + margin):
+        return True
+    if value <= threshold * (1 - margin):
+        return False
+    return None
+
+def _validation_verdict(features, margin=0.0):
+    """
+    The validator rules. With a margin the features are estimates and a
+    rule only counts when the estimate clears its threshold by that margin.
+    Returns (is_food, confidence), or None when the margin leaves it open
+    """
+    # Check if image is too uniform
+    std_dev = features.std_dev
+    uniform = _below(std_dev, 15, margin)
+    if uniform:
+        return False, 0.2
+
+    # Check color distribution
+    color_variance = np.std(features.avg_color)
+    flat_color = _below(color_variance, 5, margin)
+    if uniform is None or flat_color is None:
+        return None
+    if flat_color:
+        return False, 0.3
+
+    # Check brightness
+    brightness = features.brightness
+    too_dark = _below(brightness, 20, margin)
+    too_bright = _above(brightness, 250, margin)
+    if too_dark or too_bright:
+        return True, 0.5
+    if too_dark is None or too_bright is None:
+        return None
+
+    # Calculate edge density
+    edges = features.edges_vertical
+    few_edges = _below(edges, 5, margin)
+    if few_edges is None:
+        return None
+    if few_edges:
+        return False, 0.4
+
+    confidence = 0.6 + (edges / 50) + (std_dev / 100)
+    # An estimate only gives the exact confidence once it is clearly capped
+    if margin and _below(confidence, 0.95, margin) is not False:
+        return None
+    return True, min(0.95, confidence)
+
+@timed('validation')
+def validate_food_cascade(image):
+    """
+    Coarse-to-fine validation: small pixel samples first, escalating to the
+    full analysis frame only when a sample can't settle the verdict. Early
+    exits need every estimate to clear its threshold by the level's margin,
+    so they agree with the full-resolution check on all but rare borderline
+    images.
+    Accepts a PIL image, an analysis buffer or precomputed ImageFeatures
+    Returns {'is_food', 'confidence', 'level', 'features'} where level is
+    the resolution the cascade stopped at and features its ImageFeatures
+    (sampled estimates when it stopped early)
+    """
+    if not isinstance(image, ImageFeatures):
+        frame = _analysis_frame(image)
+        for size, margin in CASCADE_LEVELS:
+            features = _sampled_features(frame, size)
+            verdict = _validation_verdict(features, margin)
+            if verdict is not None:
+                count(f'validation_level_{size}')
+                return {'is_food': verdict[0], 'confidence': verdict[1], 'level': size, 'features': features}
+        image = frame
+
+    features = extract_image_features(image)
+    is_food, confidence = _validation_verdict(features)
+    count(f'validation_level_{ANALYSIS_SIZE[0]}')
+    return {'is_food': is_food, 'confidence': confidence, 'level': ANALYSIS_SIZE[0], 'features': features}
+
+def validate_food_image(image):
+    """
+    Validate if the image actually contains food
+    Accepts a PIL image, an analysis buffer or precomputed ImageFeatures
+    Returns: (is_food: bool, confidence: float)
+    """
+    try:
+        verdict = validate_food_cascade(image)
+        return verdict['is_food'], verdict['confidence']
 
     except Exception as e:
         print(f"Validation error: {e}")
@@ -112,42 +443,47 @@ def validate_food_image(image):
 def analyze_image_features(image):
     """
     Detailed image analysis for better food recognition
+    Accepts a PIL image, an analysis buffer or precomputed ImageFeatures
     """
-    img_array = np.array(image.resize((224, 224)))
+    features = extract_image_features(image)
 
     # Color analysis
-    avg_color = img_array.mean(axis=(0, 1))
+    avg_color = features.avg_color
     red, green, blue = avg_color[0], avg_color[1], avg_color[2]
 
     # Brightness and saturation
-    brightness = avg_color.mean()
-    saturation = np.std(img_array)
+    brightness = features.brightness
+    saturation = features.std_dev
 
     # Dominant color detection
-    red_dominant = red > green + 20 and red > blue + 20
-    green_dominant = green > red + 20 and green > blue + 20
-    yellow_dominant = red > 150 and green > 150 and blue < 120
-    brown_dominant = 80 < red < 150 and 60 < green < 120 and blue < 100
-    white_dominant = brightness > 200 and saturation < 30
-
-    # Texture analysis
-    gray = np.mean(img_array, axis=2)
-    edges_horizontal = np.abs(gray[:, 1:] - gray[:, :-1]).mean()
-    edges_vertical = np.abs(gray[1:, :] - gray[:-1, :]).mean()
-    texture_score = (edges_horizontal + edges_vertical) / 2
+    dominant = _dominant_colors(red, green, blue, brightness, saturation)
 
     return {
         'avg_color': avg_color,
         'brightness': brightness,
         'saturation': saturation,
-        'red_dominant': red_dominant,
-        'green_dominant': green_dominant,
-        'yellow_dominant': yellow_dominant,
-        'brown_dominant': brown_dominant,
-        'white_dominant': white_dominant,
-        'texture_score': texture_score
+        'red_dominant': dominant['red_dominant'],
+        'green_dominant': dominant['green_dominant'],
+        'yellow_dominant': dominant['yellow_dominant'],
+        'brown_dominant': dominant['brown_dominant'],
+        'white_dominant': dominant['white_dominant'],
+        'texture_score': features.texture_score
     }
 
+def _dominant_colors(red, green, blue, brightness, saturation):
+    """
+    Dominant color flags; works on scalars and on per-image arrays alike
+    """
+    return {
+        'red_dominant': (red > green + 20) & (red > blue + 20),
+        'green_dominant': (green > red + 20) & (green > blue + 20),
+        'yellow_dominant': (red > 150) & (green > 150) & (blue < 120),
+        'brown_dominant': ((80 < red) & (red < 150) & (60 < green) & (green < 120)
+                           & (blue < 100)),
+        'white_dominant': (brightness > 200) & (saturation < 30),
+    }
+
+@timed('matching')
 def match_food_by_features(features):
     """
     Match food based on visual features with confidence scoring
@@ -206,19 +542,22 @@ def match_food_by_features(features):
 def recognize_food_advanced(image):
     """
     Advanced food recognition with confidence scoring
+    Accepts a PIL image, an analysis buffer or precomputed ImageFeatures
     """
-    features = analyze_image_features(image)
-    food_name, confidence = match_food_by_features(features)
+    features = extract_image_features(image)
+    if CLASSIFIER is not None and features.color_histogram is not None:
+        top = CLASSIFIER.predict(feature_vectors([features]))[0]
+        return {
+            'name': top[0][0],
+            'confidence': top[0][1],
+            'alternatives': [label for label, _ in top[1:4]]
+        }
 
-    all_matches = []
-    for food_key, food_data in INDIAN_FOOD_DATABASE.items():
-        color_diff = np.abs(np.array(food_data['color_profile']) - features['avg_color']).mean()
-        similarity = max(0, 1 - (color_diff / 255))
-
-        if similarity > 0.5:
-            all_matches.append((food_key, similarity * 0.9))
+    features = analyze_image_features(features)
+    food_name, confidence = match_food_by_features(features)
 
-    all_matches.sort(key=lambda x: x[1], reverse=True)
+    # The closest color match is skipped; it usually repeats the detection
+    all_matches = find_color_matches(features['avg_color'], k=4)
     alternatives = [m[0] for m in all_matches[1:4]]
 
     return {
@@ -226,3 +565,184 @@ def recognize_food_advanced(image):
         'confidence': confidence,
         'alternatives': alternatives
     }
+
+# Plate mode: the frame is split into REGION_GRID x REGION_GRID tiles
+REGION_GRID = 8
+
+# Neighbouring tiles closer than this (mean per-channel color difference,
+# texture score difference) belong to the same region
+REGION_COLOR_TOLERANCE = 20
+REGION_TEXTURE_TOLERANCE = 8
+
+# Regions covering less of the frame than this are ignored as noise
+MIN_REGION_FRACTION = 0.05
+
+def _tile_statistics(frame, grid):
+    """
+    Per-tile color sums, sums of squares and texture scores for an
+    H x W x 3 uint8 frame, from one strided reshape of the frame
+    Returns (color_sums, square_sums, texture, tile_pixels)
+    """
+    height, width, _ = frame.shape
+    tile_h, tile_w = height // grid, width // grid
+    tiles = frame[:grid * tile_h, :grid * tile_w].reshape(grid, tile_h, grid, tile_w, 3)
+
+    color_sums = tiles.sum(axis=(1, 3), dtype=np.uint32)
+    square_sums = np.square(tiles, dtype=np.uint16).sum(axis=(1, 3, 4), dtype=np.uint64)
+
+    # Edges within each tile only, so tile borders between dishes don't count
+    gray = tiles[..., 0].astype(np.int16) + tiles[..., 1] + tiles[..., 2]
+    edges_horizontal = np.abs(np.diff(gray, axis=3)).sum(axis=(1, 3)) / (3 * tile_h * (tile_w - 1))
+    edges_vertical = np.abs(np.diff(gray, axis=1)).sum(axis=(1, 3)) / (3 * (tile_h - 1) * tile_w)
+
+    return color_sums, square_sums, (edges_horizontal + edges_vertical) / 2, tile_h * tile_w
+
+def _merge_tiles(avg_colors, texture):
+    """
+    Label connected groups of similar neighbouring tiles. Every tile starts
+    with its own index and repeatedly takes the smallest label among the
+    neighbours it joins, with pointer jumping to shorten long chains.
+    Returns a grid x grid array of region labels
+    """
+    grid = texture.shape[0]
+    join_right = ((np.abs(avg_colors[:, 1:] - avg_colors[:, :-1]).mean(axis=2) <= REGION_COLOR_TOLERANCE)
+                  & (np.abs(texture[:, 1:] - texture[:, :-1]) <= REGION_TEXTURE_TOLERANCE))
+    join_down = ((np.abs(avg_colors[1:] - avg_colors[:-1]).mean(axis=2) <= REGION_COLOR_TOLERANCE)
+                 & (np.abs(texture[1:] - texture[:-1]) <= REGION_TEXTURE_TOLERANCE))
+
+    none = grid * grid
+    labels = np.arange(none).reshape(grid, grid)
+    while True:
+        merged = labels.copy()
+        merged[:, 1:] = np.minimum(merged[:, 1:], np.where(join_right, labels[:, :-1], none))
+        merged[:, :-1] = np.minimum(merged[:, :-1], np.where(join_right, labels[:, 1:], none))
+        merged[1:] = np.minimum(merged[1:], np.where(join_down, labels[:-1], none))
+        merged[:-1] = np.minimum(merged[:-1], np.where(join_down, labels[1:], none))
+        merged = merged.ravel()[merged]
+        if np.array_equal(merged, labels):
+            return labels
+        labels = merged
+
+@timed('plate_recognition')
+def recognize_plate(image, grid=REGION_GRID):
+    """
+    Multi-food detection for thalis and mixed plates: tiles with similar
+    color and texture are merged into regions and each region is matched
+    on its own. Regions recognized as the same dish are combined.
+    Accepts a PIL image or an analysis buffer
+    Returns [{'name', 'confidence', 'area'}], largest area first, where
+    area is the fraction of the frame the dish covers
+    """
+    color_sums, square_sums, texture, tile_pixels = _tile_statistics(_analysis_frame(image), grid)
+    labels = _merge_tiles(color_sums / tile_pixels, texture)
+
+    # Pool tile sums into region sums, so region statistics stay exact
+    _, region_of, tiles = np.unique(labels.ravel(), return_inverse=True, return_counts=True)
+    color_sums = color_sums.reshape(-1, 3)
+    region_colors = np.stack([np.bincount(region_of, weights=color_sums[:, channel])
+                              for channel in range(3)], axis=1)
+    region_squares = np.bincount(region_of, weights=square_sums.ravel())
+    region_texture = np.bincount(region_of, weights=texture.ravel()) / tiles
+
+    pixels = tiles * tile_pixels
+    avg_colors = region_colors / pixels[:, None]
+    brightness = avg_colors.mean(axis=1)
+    std_devs = np.sqrt(np.maximum(region_squares / (pixels * 3) - brightness ** 2, 0))
+    dominant = _dominant_colors(avg_colors[:, 0], avg_colors[:, 1], avg_colors[:, 2],
+                                brightness, std_devs)
+    areas = tiles / (grid * grid)
+
+    dishes = {}
+    for i in np.flatnonzero(areas >= MIN_REGION_FRACTION):
+        food_name, confidence = match_food_by_features({
+            'avg_color': avg_colors[i],
+            'brightness': brightness[i],
+            'saturation': std_devs[i],
+            'red_dominant': dominant['red_dominant'][i],
+            'green_dominant': dominant['green_dominant'][i],
+            'yellow_dominant': dominant['yellow_dominant'][i],
+            'brown_dominant': dominant['brown_dominant'][i],
+            'white_dominant': dominant['white_dominant'][i],
+            'texture_score': region_texture[i]
+        })
+        dish = dishes.setdefault(food_name, {'name': food_name, 'confidence': 0.0, 'area': 0.0})
+        dish['confidence'] = max(dish['confidence'], float(confidence))
+        dish['area'] += float(areas[i])
+
+    return sorted(dishes.values(), key=lambda dish: dish['area'], reverse=True)
+
+# Frames stacked per vectorized pass; bounds the temporaries to ~30MB
+BATCH_CHUNK_SIZE = 64
+
+def extract_batch_features(images, histograms=None):
+    """
+    Compute ImageFeatures for many images with NumPy reductions along the
+    batch axis instead of one Python pass per image. Color histograms are
+    included when histograms is true (default: when a classifier is loaded).
+    """
+    if histograms is None:
+        histograms = CLASSIFIER is not None
+    features = []
+    for start in range(0, len(images), BATCH_CHUNK_SIZE):
+        chunk = images[start:start + BATCH_CHUNK_SIZE]
+        stack = np.stack([_analysis_frame(image) for image in chunk])
+        avg_colors, std_devs, edges_horizontal, edges_vertical = _frame_statistics(stack)
+        color_hists = color_histograms(stack) if histograms else [None] * len(chunk)
+
+        for i in range(len(chunk)):
+            features.append(ImageFeatures(avg_colors[i], std_devs[i], edges_horizontal[i],
+                                          edges_vertical[i], color_hists[i]))
+    return features
+
+@timed('batch_recognition')
+def recognize_food_batch(images):
+    """
+    Recognize a list of images (PIL images, analysis buffers or ImageFeatures)
+    Returns one result dict per image, identical to recognize_food_advanced
+    """
+    images = list(images)
+    pending = [i for i, image in enumerate(images) if not isinstance(image, ImageFeatures)]
+    features = list(images)
+    for i, extracted in zip(pending, extract_batch_features([images[i] for i in pending])):
+        features[i] = extracted
+    if not features:
+        return []
+
+    if CLASSIFIER is not None and all(f.color_histogram is not None for f in features):
+        # Every image against every prototype in one matrix product
+        return [{
+            'name': top[0][0],
+            'confidence': top[0][1],
+            'alternatives': [label for label, _ in top[1:4]]
+        } for top in CLASSIFIER.predict(feature_vectors(features))]
+
+    avg_colors = np.array([f.avg_color for f in features])
+    brightness = np.array([f.brightness for f in features])
+    saturation = np.array([f.std_dev for f in features])
+    texture = np.array([f.texture_score for f in features])
+    dominant = _dominant_colors(avg_colors[:, 0], avg_colors[:, 1], avg_colors[:, 2],
+                                brightness, saturation)
+
+    # Color matches of every image against the catalogue at once
+    color_matches = find_color_matches(avg_colors, k=4)
+
+    results = []
+    for i in range(len(features)):
+        food_name, confidence = match_food_by_features({
+            'avg_color': avg_colors[i],
+            'brightness': brightness[i],
+            'saturation': saturation[i],
+            'red_dominant': dominant['red_dominant'][i],
+            'green_dominant': dominant['green_dominant'][i],
+            'yellow_dominant': dominant['yellow_dominant'][i],
+            'brown_dominant': dominant['brown_dominant'][i],
+            'white_dominant': dominant['white_dominant'][i],
+            'texture_score': texture[i]
+        })
+
+        results.append({
+            'name': food_name,
+            'confidence': confidence,
+            'alternatives': [m[0] for m in color_matches[i][1:4]]
+        })
+    return results
@@ -0,0 +1,94 @@
+"""
+Image Preprocessing Module
+Decodes uploads straight into the canonical RGB buffer used for analysis
+"""
+from PIL import Image, ImageOps
+import numpy as np
+
+from metrics import timed
+
+# Every analysis stage works on the same downscaled frame
+ANALYSIS_SIZE = (224, 224)
+
+# EXIF tag holding the camera orientation
+_EXIF_ORIENTATION = 0x0112
+
+# Modes whose samples do not fit in 8 bits
+_WIDE_MODES = ('I', 'I;16', 'I;16L', 'I;16B', 'I;16N', 'F')
+
+# Largest image decoded for analysis (covers 50 MP phone cameras); a
+# PNG near Pillow's own ~179 MP limit would take hundreds of MB to decode
+MAX_IMAGE_PIXELS = 50_000_000
+
+class ImageTooLarge(ValueError):
+    """
+    Raised by load_image for images over MAX_IMAGE_PIXELS
+    """
+
+# What decoding one bad file can raise: PIL's errors for truncated or
+# unsupported images, ImageTooLarge, and DecompressionBombError, which
+# derives from neither, for images past Pillow's own pixel limit
+DECODE_ERRORS = (OSError, SyntaxError, ValueError, Image.DecompressionBombError)
+
+def load_image(source, target_size=ANALYSIS_SIZE):
+    """
+    Open an image file or file-like object for analysis at target_size.
+    JPEGs are decoded at the smallest DCT scale that still covers the
+    target, EXIF orientation is applied and the result is canonical RGB.
+    Raises ImageTooLarge before decoding anything over MAX_IMAGE_PIXELS.
+    """
+    image = Image.open(source)
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ImageTooLarge(f"{width}x{height} pixels, limit is {MAX_IMAGE_PIXELS}")
+
+    # Let libjpeg skip most of the full-resolution work
+    if image.format == 'JPEG':
+        image.draft('RGB', target_size)
+
+    # exif_transpose copies even when nothing changes, so check first
+    if image.getexif().get(_EXIF_ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+
+    return to_rgb(image)
+
+def to_rgb(image):
+    """
+    Convert any PIL mode to 8-bit RGB. Transparent pixels are composited
+    onto white and 16/32-bit samples are scaled down instead of clipped.
+    """
+    mode = image.mode
+    if mode == 'RGB':
+        return image
+
+    if mode in _WIDE_MODES:
+        values = np.asarray(image, dtype=np.float32)
+        if mode.startswith('I;16') or values.max() > 255:
+            values = values / 257
+        gray = np.clip(values, 0, 255).astype(np.uint8)
+        return Image.fromarray(gray, 'L').convert('RGB')
+
+    if mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La') or 'transparency' in image.info:
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+
+    return image.convert('RGB')
+
+def rgb_array(image, size=ANALYSIS_SIZE):
+    """
+    Canonical analysis buffer: a read-only, C-contiguous H x W x 3 uint8
+    array. This is the only copy out of PIL; later stages take views of it.
+    """
+    image = to_rgb(image)
+    if image.size != size:
+        image = image.resize(size)
+    return np.asarray(image)
+
+@timed('decode')
+def load_analysis_frame(source, size=ANALYSIS_SIZE):
+    """
+    Decode straight to the canonical analysis buffer
+    """
+    return rgb_array(load_image(source, size), size)
@@ -0,0 +1,128 @@
+"""
+Daily Intake Tracker
+Aggregates logged foods into plate and daily totals against a calorie target
+"""
+from datetime import date
+
+import numpy as np
+
+from nutrition_api import MACRO_FIELDS, NUTRITION_TABLE, get_nutrition_data, lookup_food
+
+def macro_matrix(food_names, nutrition_overrides=None):
+    """
+    One row of MACRO_FIELDS per food. Known foods are gathered from the
+    nutrition table in a single indexing pass; unknown ones fall back to
+    their nutrition record (or the one given in nutrition_overrides).
+    """
+    nutrition_overrides = nutrition_overrides or {}
+    matrix = np.empty((len(food_names), len(MACRO_FIELDS)), dtype=np.float64)
+
+    known, rows = [], []
+    for i, name in enumerate(food_names):
+        match = lookup_food(name) if name not in nutrition_overrides else None
+        food_id = match and match['food_id']
+        # Foods from the on-disk store aren't in the in-memory table
+        if food_id in NUTRITION_TABLE.row_index:
+            known.append(i)
+            rows.append(NUTRITION_TABLE.row_index[food_id])
+        else:
+            record = nutrition_overrides.get(name) or get_nutrition_data(name, match)
+            matrix[i] = [record[field] for field in MACRO_FIELDS]
+
+    if known:
+        matrix[known] = NUTRITION_TABLE.macros[rows]
+    return matrix
+
+def plate_totals(items):
+    """
+    Summed macros of a plate given as [(food_name, portion)]
+    Returns {field: total}
+    """
+    if not items:
+        return dict.fromkeys(MACRO_FIELDS, 0.0)
+    names = [name for name, _ in items]
+    portions = np.array([portion for _, portion in items], dtype=np.float64)
+    return dict(zip(MACRO_FIELDS, (portions @ macro_matrix(names)).tolist()))
+
+def region_portions(regions):
+    """
+    Servings per detected plate region, given [{'name', 'area', ...}].
+    Servings follow each dish's share of the food area and average one per
+    dish, so four equal bowls on a thali count as one serving each.
+    Returns [(food_name, portion)]
+    """
+    food_area = sum(region['area'] for region in regions)
+    if not food_area:
+        return []
+    return [(region['name'], region['area'] / food_area * len(regions)) for region in regions]
+
+class DailyIntake:
+    """
+    Logged foods for one day with running totals. Adding or removing an
+    item updates the totals in place, so a Streamlit rerun only reads them.
+    """
+
+    def __init__(self, calorie_target, day=None):
+        self.day = day or date.today()
+        self.calorie_target = calorie_target
+        self.items = []
+        self._totals = np.zeros(len(MACRO_FIELDS))
+
+    def add_item(self, food_name, portion=1.0, nutrition_data=None):
+        """
+        Log one food; nutrition_data overrides the table lookup when given
+        """
+        return self.add_plate([(food_name, portion)],
+                              {food_name: nutrition_data} if nutrition_data else None)[0]
+
+    def add_plate(self, items, nutrition_overrides=None):
+        """
+        Log several foods given as [(food_name, portion)] at once
+        """
+        if not items:
+            return []
+        names = [name for name, _ in items]
+        portions = np.array([portion for _, portion in items], dtype=np.float64)
+        scaled = macro_matrix(names, nutrition_overrides) * portions[:, None]
+
+        self._totals += scaled.sum(axis=0)
+        added = [{
+            'food_name': name,
+            'portion': float(portion),
+            'macros': dict(zip(MACRO_FIELDS, row.tolist()))
+        } for name, portion, row in zip(names, portions, scaled)]
+        self.items.extend(added)
+        return added
+
+    def remove_item(self, index):
+        """
+        Remove a logged item by position and subtract it from the totals
+        """
+        item = self.items.pop(index)
+        self._totals -= [item['macros'][field] for field in MACRO_FIELDS]
+        # Guard against float drift below zero once the log is emptied
+        if not self.items:
+            self._totals[:] = 0
+        return item
+
+    @property
+    def totals(self):
+        return dict(zip(MACRO_FIELDS, self._totals.tolist()))
+
+    @property
+    def calories(self):
+        return float(self._totals[0])
+
+    @property
+    def remaining_calories(self):
+        return self.calorie_target - self.calories
+
+    @property
+    def progress(self):
+        """
+        Fraction of the calorie target eaten so far
+        """
+        return self.calories / self.calorie_target if self.calorie_target else 0.0
+
+    def is_current(self, today=None):
+        return self.day == (today or date.today())
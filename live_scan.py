@@ -0,0 +1,203 @@
+"""
+Live Scan
+Continuous recognition over a webcam or video file with a steady label
+
+    python live_scan.py 0                  # default webcam
+    python live_scan.py lunch.mp4 --fps 15
+
+Frames that barely differ from the last analyzed one are skipped, analysis
+is rationed to a per-frame time budget, and labels are smoothed over a
+sliding window. Reading video needs OpenCV (pip install opencv-python).
+"""
+import argparse
+import sys
+import time
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+from food_recognition import extract_image_features, recognize_food_advanced, validate_food_cascade
+from image_preprocessing import ANALYSIS_SIZE, rgb_array
+from metrics import count, timed
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Frames are compared as DIFF_GRID x DIFF_GRID block sums
+DIFF_GRID = 32
+
+# Mean absolute block difference (0-255 scale) below which a frame is skipped
+DIFF_THRESHOLD = 6.0
+
+# Recent frames voting on the displayed label; a skipped unchanged frame
+# repeats the last analyzed result
+SMOOTHING_WINDOW = 8
+
+DEFAULT_FPS = 15
+
+def frame_signature(frame, grid=DIFF_GRID):
+    """
+    Coarse brightness map of an H x W x 3 uint8 frame: channel sums over a
+    grid x grid block layout, from one strided reshape of the frame
+    """
+    height, width, _ = frame.shape
+    block_h, block_w = height // grid, width // grid
+    blocks = frame[:grid * block_h, :grid * block_w].reshape(grid, block_h, grid, block_w * 3)
+    return blocks.sum(axis=(1, 3), dtype=np.uint32) / (block_h * block_w * 3)
+
+class LiveRecognizer:
+    """
+    Feeds a stream of RGB frames through the recognizer without running
+    the full pipeline on every frame. A frame is analyzed only when it has
+    changed enough since the last analyzed one and the time spent so far
+    fits the per-frame budget. Every result, repeated for each unchanged
+    frame after it, joins a sliding window whose confidence-weighted vote
+    gives the displayed label.
+    """
+
+    def __init__(self, fps=DEFAULT_FPS, window=SMOOTHING_WINDOW, diff_threshold=DIFF_THRESHOLD):
+        self.frame_budget = 1.0 / fps
+        self.diff_threshold = diff_threshold
+        self.window = deque(maxlen=window)
+        self.frames = 0
+        self.analyzed = 0
+        self.skipped_static = 0
+        self.skipped_budget = 0
+        self._signature = None
+        self._last_result = None
+        # Analysis time not yet covered by the budget of the frames since
+        self._debt = 0.0
+
+    def process(self, frame):
+        """
+        Take one H x W x 3 uint8 RGB frame
+        Returns the smoothed state, see current()
+        """
+        self.frames += 1
+        self._debt -= self.frame_budget
+        if self._debt > 0:
+            self.skipped_budget += 1
+            count('live_skipped_budget')
+            return self.current()
+
+        signature = frame_signature(frame)
+        if (self._signature is not None
+                and np.abs(signature - self._signature).mean() < self.diff_threshold):
+            self.skipped_static += 1
+            count('live_skipped_static')
+            # The scene still shows what was last analyzed, so it votes
+            # again; otherwise one result after a change can't outvote
+            # the window and the old label sticks
+            self.window.append(self._last_result)
+            # An idle budget doesn't carry over to later frames
+            self._debt = max(self._debt, 0.0)
+            return self.current()
+
+        started = time.perf_counter()
+        self._last_result = self._analyze(frame)
+        self.window.append(self._last_result)
+        self._signature = signature
+        self.analyzed += 1
+        self._debt = max(self._debt, 0.0) + time.perf_counter() - started
+        return self.current()
+
+    @timed('live_frame')
+    def _analyze(self, frame):
+        buffer = rgb_array(Image.fromarray(frame))
+        verdict = validate_food_cascade(buffer)
+        if not verdict['is_food']:
+            return None, 0.0
+        # A cascade that escalated to full size has the features already
+        features = verdict['features']
+        if verdict['level'] != ANALYSIS_SIZE[0]:
+            features = extract_image_features(buffer)
+        result = recognize_food_advanced(features)
+        return result['name'], float(result['confidence'])
+
+    def current(self):
+        """
+        Smoothed state: {'name', 'confidence', 'votes'}. The label with the
+        highest summed confidence in the window wins; its confidence is that
+        sum over the window length, so flickering labels score low. name is
+        None until food has been seen.
+        """
+        scores = {}
+        for name, confidence in self.window:
+            if name is not None:
+                scores[name] = scores.get(name, 0.0) + confidence
+        if not scores:
+            return {'name': None, 'confidence': 0.0, 'votes': 0}
+        name = max(scores, key=scores.get)
+        return {
+            'name': name,
+            'confidence': scores[name] / len(self.window),
+            'votes': sum(1 for label, _ in self.window if label == name)
+        }
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'analyzed': self.analyzed,
+            'skipped_static': self.skipped_static,
+            'skipped_budget': self.skipped_budget
+        }
+
+def video_frames(source):
+    """
+    RGB frames from a webcam index ("0") or a video file, via OpenCV
+    """
+    if cv2 is None:
+        raise RuntimeError("Live scanning needs OpenCV: pip install opencv-python")
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not capture.isOpened():
+        raise OSError(f"Cannot open video source {source}")
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        capture.release()
+
+def run(frames, recognizer, out=sys.stdout):
+    """
+    Recognize a frame stream, printing whenever the steady label changes
+    Returns the final smoothed state
+    """
+    shown = None
+    state = recognizer.current()
+    for frame in frames:
+        state = recognizer.process(frame)
+        if state['name'] != shown:
+            shown = state['name']
+            label = shown.title() if shown else "No food"
+            print(f"frame {recognizer.frames}: {label} ({state['confidence']*100:.0f}%)", file=out)
+    return state
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recognize food continuously from a webcam or video file")
+    parser.add_argument('source', help="webcam index (e.g. 0) or video file path")
+    parser.add_argument('--fps', type=float, default=DEFAULT_FPS, help="frame rate the analysis must keep up with")
+    parser.add_argument('--window', type=int, default=SMOOTHING_WINDOW, help="recent frames to smooth over")
+    parser.add_argument('--threshold', type=float, default=DIFF_THRESHOLD,
+                        help="mean block difference below which a frame is skipped")
+    args = parser.parse_args(argv)
+
+    recognizer = LiveRecognizer(args.fps, args.window, args.threshold)
+    started = time.perf_counter()
+    try:
+        run(video_frames(args.source), recognizer)
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - started
+    stats = recognizer.stats()
+    rate = stats['frames'] / elapsed if elapsed else 0.0
+    print(f"{stats['frames']} frames in {elapsed:.1f}s ({rate:.1f} fps): {stats['analyzed']} analyzed, "
+          f"{stats['skipped_static']} unchanged, {stats['skipped_budget']} over budget")
+
+if __name__ == '__main__':
+    main()
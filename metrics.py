@@ -0,0 +1,182 @@
+"""
+Pipeline Metrics
+Stage timing histograms and event counters, exported in Prometheus text format
+
+Off unless SCANEAT_METRICS=1 is set before import. When off, @timed returns
+the function unchanged and stage()/count() do nothing, so there is no overhead.
+"""
+import bisect
+import contextlib
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get('SCANEAT_METRICS', '').lower() in ('1', 'true', 'yes')
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+DEFAULT_PORT = int(os.environ.get('SCANEAT_METRICS_PORT', '9108'))
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, fraction):
+        """
+        Upper bound of the bucket holding the given quantile
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class MetricsRegistry:
+    """
+    Thread-safe store of stage histograms and event counters
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, event, amount=1):
+        with self._lock:
+            self.counters[event] = self.counters.get(event, 0) + amount
+
+    def snapshot(self):
+        """
+        Per-stage summaries and counters, for the debug panel
+        """
+        with self._lock:
+            stages = {
+                stage: {
+                    'count': h.count,
+                    'mean_ms': h.total / h.count * 1000 if h.count else 0.0,
+                    'p95_ms_le': h.quantile(0.95) * 1000
+                }
+                for stage, h in sorted(self.histograms.items())
+            }
+            return {'stages': stages, 'counters': dict(sorted(self.counters.items()))}
+
+    def render_prometheus(self):
+        """
+        Prometheus text exposition format (version 0.0.4)
+        """
+        lines = []
+        with self._lock:
+            lines.append('# HELP scaneat_stage_seconds Time spent in each pipeline stage')
+            lines.append('# TYPE scaneat_stage_seconds histogram')
+            for stage, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'scaneat_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'scaneat_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'scaneat_stage_seconds_sum{{stage="{stage}"}} {h.total}')
+                lines.append(f'scaneat_stage_seconds_count{{stage="{stage}"}} {h.count}')
+
+            lines.append('# HELP scaneat_events_total Pipeline events such as cache hits')
+            lines.append('# TYPE scaneat_events_total counter')
+            for event, value in sorted(self.counters.items()):
+                lines.append(f'scaneat_events_total{{event="{event}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+class _StageTimer:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        REGISTRY.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+_NO_TIMER = contextlib.nullcontext()
+
+def stage(name):
+    """
+    Context manager timing a block as one stage observation
+    """
+    return _StageTimer(name) if ENABLED else _NO_TIMER
+
+def timed(name):
+    """
+    Decorator timing every call as one stage observation
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def count(event, amount=1):
+    """
+    Bump an event counter (cache hits, low-confidence results, ...)
+    """
+    if ENABLED:
+        REGISTRY.increment(event, amount)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port=DEFAULT_PORT, host='127.0.0.1'):
+    """
+    Serve /metrics from a daemon thread; returns the server
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='scaneat-metrics', daemon=True).start()
+    return server
@@ -2,6 +2,15 @@
 Nutrition API Integration Module
 Comprehensive Indian food nutrition database
 """
+import functools
+
+import numpy as np
+
+from food_search import TrigramIndex, same_words
+from metrics import timed
+from nutrition_provider import open_default_provider
+from nutrition_record import MACRO_FIELDS, NutritionRecord
+from nutrition_store import open_default_store
 
 # Nutrition database with 30+ Indian foods
 NUTRITION_DATABASE = {
@@ -16,17 +25,6 @@ NUTRITION_DATABASE = {
         "minerals": ["Iron", "Magnesium", "Phosphorus"],
         "serving_size": "1 cup (158g)"
     },
-    "white rice": {
-        "calories": 206,
-        "protein": 4.3,
-        "carbs": 45,
-        "fat": 0.4,
-        "fiber": 0.6,
-        "sugar": 0.1,
-        "vitamins": ["Vitamin B1", "Vitamin B3", "Folate"],
-        "minerals": ["Iron", "Magnesium", "Phosphorus"],
-        "serving_size": "1 cup (158g)"
-    },
     "dal tadka": {
         "calories": 180,
         "protein": 12,
@@ -38,28 +36,6 @@ NUTRITION_DATABASE = {
         "minerals": ["Iron", "Magnesium", "Potassium", "Zinc"],
         "serving_size": "1 bowl (200g)"
     },
-    "dal fry": {
-        "calories": 180,
-        "protein": 12,
-        "carbs": 28,
-        "fat": 3.5,
-        "fiber": 8,
-        "sugar": 2,
-        "vitamins": ["Vitamin B1", "Vitamin B6", "Folate"],
-        "minerals": ["Iron", "Magnesium", "Potassium", "Zinc"],
-        "serving_size": "1 bowl (200g)"
-    },
-    "yellow dal": {
-        "calories": 180,
-        "protein": 12,
-        "carbs": 28,
-        "fat": 3.5,
-        "fiber": 8,
-        "sugar": 2,
-        "vitamins": ["Vitamin B1", "Vitamin B6", "Folate"],
-        "minerals": ["Iron", "Magnesium", "Potassium", "Zinc"],
-        "serving_size": "1 bowl (200g)"
-    },
     "roti": {
         "calories": 120,
         "protein": 4,
@@ -71,17 +47,6 @@ NUTRITION_DATABASE = {
         "minerals": ["Iron", "Magnesium", "Selenium"],
         "serving_size": "1 piece (60g)"
     },
-    "chapati": {
-        "calories": 120,
-        "protein": 4,
-        "carbs": 23,
-        "fat": 2,
-        "fiber": 3,
-        "sugar": 0.5,
-        "vitamins": ["Vitamin B1", "Vitamin B3", "Folate"],
-        "minerals": ["Iron", "Magnesium", "Selenium"],
-        "serving_size": "1 piece (60g)"
-    },
     "paneer butter masala": {
         "calories": 350,
         "protein": 18,
@@ -181,17 +146,6 @@ NUTRITION_DATABASE = {
         "minerals": ["Iron", "Calcium", "Potassium"],
         "serving_size": "1 dosa (150g)"
     },
-    "masala dosa": {
-        "calories": 220,
-        "protein": 6,
-        "carbs": 42,
-        "fat": 4,
-        "fiber": 3,
-        "sugar": 2,
-        "vitamins": ["Vitamin B1", "Vitamin C", "Folate"],
-        "minerals": ["Iron", "Calcium", "Potassium"],
-        "serving_size": "1 dosa (150g)"
-    },
     "plain dosa": {
         "calories": 168,
         "protein": 4,
@@ -238,24 +192,231 @@ NUTRITION_DATABASE = {
     },
 }
 
-def get_nutrition_data(food_name):
+# Frozen records: safe to hand to every session, with shared vitamin and
+# mineral tuples instead of a list per entry
+NUTRITION_DATABASE = {food_id: NutritionRecord.from_mapping(record)
+                      for food_id, record in NUTRITION_DATABASE.items()}
+
+# Other names for foods above; each alias resolves to the canonical ID
+NUTRITION_ALIASES = {
+    "rice": ["white rice"],
+    "dal tadka": ["dal fry", "yellow dal"],
+    "roti": ["chapati"],
+    "dosa": ["masala dosa"],
+}
+
+def normalize_food_name(food_name):
+    """
+    Canonical spelling used for every lookup key
+    """
+    return " ".join(food_name.lower().replace("-", " ").replace("_", " ").split())
+
+def build_alias_index():
+    """
+    Compile name -> canonical ID from the nutrition aliases and the
+    recognition catalogue's common names. Canonical IDs always win,
+    then explicit aliases, then common names.
+    """
+    from food_recognition import INDIAN_FOOD_DATABASE
+
+    index = {normalize_food_name(food_id): food_id for food_id in NUTRITION_DATABASE}
+
+    sources = list(NUTRITION_ALIASES.items())
+    sources += [(key, food['common_names']) for key, food in INDIAN_FOOD_DATABASE.items()]
+    for food_id, aliases in sources:
+        if food_id not in NUTRITION_DATABASE:
+            continue
+        for alias in aliases:
+            index.setdefault(normalize_food_name(alias), food_id)
+    return index
+
+ALIAS_INDEX = build_alias_index()
+
+# Ingested foods beyond the built-in ones (see nutrition_store.py); None
+# until a store has been built. Opening it is lazy and costs nothing here.
+NUTRITION_STORE = open_default_store()
+
+# External API asked about foods nothing local matches (see
+# nutrition_provider.py); None unless SCANEAT_NUTRITION_URL is set
+NUTRITION_PROVIDER = open_default_provider()
+
+def resolve_food_id(food_name):
+    """
+    Canonical nutrition ID for a food name or alias, or None if unknown:
+    the built-in alias index first, then the ingested store
+    """
+    name = normalize_food_name(food_name)
+    food_id = ALIAS_INDEX.get(name)
+    if food_id is None and NUTRITION_STORE is not None:
+        food_id = NUTRITION_STORE.resolve(name)
+    return food_id
+
+# Returned when nothing matches a food name
+DEFAULT_NUTRITION = NutritionRecord(
+    calories=250, protein=10, carbs=35, fat=8, fiber=3, sugar=5,
+    vitamins=["Vitamin B Complex", "Vitamin C"],
+    minerals=["Iron", "Calcium", "Potassium"],
+    serving_size="1 serving (200g)")
+
+# Misspellings resolve only when this similar (trigram Jaccard) to a known name
+FUZZY_MATCH_THRESHOLD = 0.45
+
+NAME_INDEX = TrigramIndex(ALIAS_INDEX)
+
+def find_food_candidates(food_name, limit=5, threshold=0.3, misspellings_only=False):
+    """
+    Ranked fuzzy candidates for a food name, best name per canonical food.
+    misspellings_only keeps only names that are the query with misspelled
+    words (see food_search.same_words), not other dishes sharing a word.
+    Returns [(food_id, matched_name, score)]
+    """
+    name = normalize_food_name(food_name)
+    matches = [(ALIAS_INDEX[matched], matched, score)
+               for matched, score in NAME_INDEX.search(name, threshold, limit * 4)]
+    if NUTRITION_STORE is not None:
+        matches += NUTRITION_STORE.search(name, threshold, limit * 4)
+        matches.sort(key=lambda m: (-m[2], m[1]))
+    if misspellings_only:
+        matches = [match for match in matches if same_words(name, match[1])]
+
+    candidates = []
+    seen = set()
+    for food_id, matched, score in matches:
+        if food_id not in seen:
+            seen.add(food_id)
+            candidates.append((food_id, matched, score))
+    return candidates[:limit]
+
+# Normalized names whose local resolution is remembered
+LOOKUP_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)
+def _local_match(name):
+    # The alias index and the store don't change while running, so one
+    # resolution per name covers every later scan, memo and intake call
+    food_id = resolve_food_id(name)
+    if food_id is not None:
+        return food_id, name, 1.0, 'exact'
+
+    candidates = find_food_candidates(name, limit=1, threshold=FUZZY_MATCH_THRESHOLD,
+                                      misspellings_only=True)
+    if candidates:
+        food_id, matched_name, score = candidates[0]
+        return food_id, matched_name, score, 'fuzzy'
+    return None
+
+def lookup_food(food_name):
     """
-    Get nutrition data for a food item
+    Resolve a food name exactly, then fuzzily, and report the match used.
+    Local resolutions are cached per normalized name.
+    Returns: {'food_id', 'matched_name', 'score', 'method'} where method is
+    'exact', 'fuzzy', 'provider' or 'default' (food_id is None for the last two)
     """
-    food_name_lower = food_name.lower().strip()
+    name = normalize_food_name(food_name)
+    match = _local_match(name)
+    if match is not None:
+        food_id, matched_name, score, method = match
+        return {'food_id': food_id, 'matched_name': matched_name, 'score': score, 'method': method}
+
+    # Not cached here: the provider's own cache knows when answers expire
+    if NUTRITION_PROVIDER is not None and NUTRITION_PROVIDER.lookup(name) is not None:
+        return {'food_id': None, 'matched_name': name, 'score': 1.0, 'method': 'provider'}
 
-    if food_name_lower in NUTRITION_DATABASE:
-        return NUTRITION_DATABASE[food_name_lower]
+    return {'food_id': None, 'matched_name': None, 'score': 0.0, 'method': 'default'}
+
+@timed('nutrition_lookup')
+def get_nutrition_data(food_name, match=None):
+    """
+    Get nutrition data for a food item, as a shared read-only NutritionRecord.
+    Pass match when lookup_food already ran for this name.
+    """
+    match = match or lookup_food(food_name)
+    food_id = match['food_id']
+
+    if food_id in NUTRITION_DATABASE:
+        return NUTRITION_DATABASE[food_id]
+    if food_id is not None and NUTRITION_STORE is not None:
+        record = NUTRITION_STORE.get(food_id)
+        if record is not None:
+            return record
+    if match['method'] == 'provider':
+        # Answered from the provider's cache, filled by lookup_food
+        record = NUTRITION_PROVIDER.lookup(match['matched_name'])
+        if record is not None:
+            return record
 
     # Default values if not found
-    return {
-        "calories": 250,
-        "protein": 10,
-        "carbs": 35,
-        "fat": 8,
-        "fiber": 3,
-        "sugar": 5,
-        "vitamins": ["Vitamin B Complex", "Vitamin C"],
-        "minerals": ["Iron", "Calcium", "Potassium"],
-        "serving_size": "1 serving (200g)"
-    }
+    return DEFAULT_NUTRITION
+
+class NutritionTable:
+    """
+    Columnar view of nutrition records: one contiguous float32 column per
+    macro, row i <-> food_ids[i]. Queries across foods become array
+    operations instead of loops over dicts.
+    """
+
+    def __init__(self, records):
+        self.food_ids = list(records)
+        self.row_index = {food_id: i for i, food_id in enumerate(self.food_ids)}
+        # Fortran order keeps each macro column contiguous
+        self.macros = np.asfortranarray(
+            [[records[food_id][field] for field in MACRO_FIELDS] for food_id in self.food_ids],
+            dtype=np.float32).reshape(len(self.food_ids), len(MACRO_FIELDS))
+
+    def __len__(self):
+        return len(self.food_ids)
+
+    def column(self, field):
+        """
+        Column for one macro field (a view, not a copy)
+        """
+        return self.macros[:, MACRO_FIELDS.index(field)]
+
+    def rows(self, food_ids):
+        """
+        Row numbers for canonical IDs; raises KeyError for unknown foods
+        """
+        return np.array([self.row_index[food_id] for food_id in food_ids], dtype=np.intp)
+
+    def mask(self, **bounds):
+        """
+        Boolean row mask from bounds such as calories_max=200, protein_min=10
+        (both inclusive)
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for key, limit in bounds.items():
+            field, _, side = key.rpartition("_")
+            if field not in MACRO_FIELDS or side not in ("min", "max"):
+                raise ValueError(f"Unknown bound: {key}")
+            column = self.column(field)
+            mask &= column >= limit if side == "min" else column <= limit
+        return mask
+
+    def filter(self, **bounds):
+        """
+        Canonical IDs of foods within every bound, in table order
+        """
+        return [self.food_ids[i] for i in np.flatnonzero(self.mask(**bounds))]
+
+    def sort(self, field, descending=False, food_ids=None):
+        """
+        Canonical IDs ordered by one macro field (all foods by default)
+        """
+        rows = np.arange(len(self)) if food_ids is None else self.rows(food_ids)
+        values = self.column(field)[rows]
+        order = np.argsort(-values if descending else values, kind="stable")
+        return [self.food_ids[i] for i in rows[order]]
+
+    def totals(self, food_ids, portions=None):
+        """
+        Summed macros of several foods, each scaled by its portion multiplier
+        Returns {field: total}
+        """
+        rows = self.rows(food_ids)
+        if portions is None:
+            sums = self.macros[rows].sum(axis=0, dtype=np.float64)
+        else:
+            sums = np.asarray(portions, dtype=np.float64) @ self.macros[rows]
+        return dict(zip(MACRO_FIELDS, sums.tolist()))
+
+NUTRITION_TABLE = NutritionTable(NUTRITION_DATABASE)
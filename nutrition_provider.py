@@ -0,0 +1,219 @@
+"""
+Nutrition Provider
+Looks up foods missing from the local table in an external HTTP API
+
+Off unless SCANEAT_NUTRITION_URL is set, e.g.
+
+    SCANEAT_NUTRITION_URL="https://nutrition.example.com/foods?name={name}"
+
+{name} is replaced by the URL-quoted food name (or appended as ?name=).
+The response is a JSON object with the macro fields (calories, protein,
+carbs, fat, fiber, sugar and optionally vitamins, minerals, serving_size),
+either at the top level or as the first item of "foods"; a 404 means the
+provider doesn't know the food.
+
+Connections are pooled in one requests.Session, concurrent lookups of one
+name share a single request, answers (including "unknown") are cached in
+memory and on disk, and a circuit breaker stops calling a provider that
+keeps failing or answering slowly. Callers wait at most LOOKUP_BUDGET
+seconds; a slower request finishes in the background and fills the cache.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from urllib.parse import quote
+
+from metrics import count
+from nutrition_record import NutritionRecord
+from scan_cache import RecognitionCache, content_key
+
+PROVIDER_URL = os.environ.get('SCANEAT_NUTRITION_URL')
+
+# Sent as a bearer token when set
+PROVIDER_KEY = os.environ.get('SCANEAT_NUTRITION_KEY')
+
+PROVIDER_CACHE_DIR = os.environ.get(
+    'SCANEAT_NUTRITION_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'provider_cache'))
+
+# Longest a lookup may hold up its caller, in seconds
+LOOKUP_BUDGET = float(os.environ.get('SCANEAT_NUTRITION_BUDGET', '0.8'))
+
+# (connect, read) timeouts of one provider request
+REQUEST_TIMEOUT = (1.0, 3.0)
+
+# Pooled connections, and provider requests in flight at once
+POOL_SIZE = 8
+
+# Found foods are cached for a week, unknown ones for an hour
+FOUND_TTL = 7 * 24 * 3600
+UNKNOWN_TTL = 3600
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures, where a request
+    slower than slow_seconds counts as a failure. While open every call is
+    refused; after reset_seconds a single trial call is let through, and
+    its outcome closes the breaker or opens it again.
+    """
+
+    def __init__(self, failure_threshold=3, reset_seconds=30.0, slow_seconds=2.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_seconds = slow_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half-open' if self._trial else 'open'
+
+    def allow(self):
+        """
+        Whether a call may go out now
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self._trial = True
+            return True
+
+    def record(self, seconds, ok):
+        """
+        Report the outcome of an allowed call
+        """
+        with self._lock:
+            self._trial = False
+            if ok and seconds <= self.slow_seconds:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    count('provider_circuit_open')
+                self.opened_at = time.monotonic()
+
+def parse_provider_record(name, payload):
+    """
+    Nutrition record from a provider response, or None when it has no
+    calories; raises ValueError on malformed numbers
+    """
+    if isinstance(payload, dict) and isinstance(payload.get('foods'), list):
+        payload = payload['foods'][0] if payload['foods'] else None
+    if not isinstance(payload, dict) or payload.get('calories') is None:
+        return None
+
+    from nutrition_api import normalize_food_name
+    from nutrition_store import parse_row
+
+    _, record, _ = parse_row(dict(payload, name=name), normalize_food_name)
+    return record
+
+class HTTPNutritionProvider:
+    """
+    Thread-safe client for one provider URL, shared by every session
+    """
+
+    def __init__(self, url, api_key=None, cache_dir=PROVIDER_CACHE_DIR, budget=LOOKUP_BUDGET,
+                 timeout=REQUEST_TIMEOUT, breaker=None):
+        # Imported here so setups without a provider don't pay for requests
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = url if '{name}' in url else url + ('&' if '?' in url else '?') + 'name={name}'
+        self.budget = budget
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = RecognitionCache(max_entries=2048, ttl_seconds=FOUND_TTL, disk_dir=cache_dir,
+                                      event_prefix='provider_cache')
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept'] = 'application/json'
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+        self._executor = ThreadPoolExecutor(POOL_SIZE, thread_name_prefix='nutrition-provider')
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, name):
+        """
+        Nutrition record for a normalized food name, or None when the
+        provider doesn't know it, is unavailable or misses the budget
+        """
+        key = content_key(name.encode('utf-8'))
+        entry = self.cache.get(key)
+        if entry is not None and (entry['record'] is not None
+                                  or time.time() - entry['checked_at'] <= UNKNOWN_TTL):
+            # Disk hits come back as plain JSON
+            return entry['record'] and NutritionRecord.from_mapping(entry['record'])
+
+        # Concurrent callers for one name wait on the same request
+        with self._lock:
+            future = self._inflight.get(name)
+            started = future is None
+            if started:
+                if not self.breaker.allow():
+                    count('provider_rejected')
+                    return None
+                future = self._executor.submit(self._fetch, name, key)
+                self._inflight[name] = future
+            else:
+                count('provider_coalesced')
+        if started:
+            # Outside the lock: a finished future runs the callback right here
+            future.add_done_callback(lambda done: self._forget(name, done))
+
+        try:
+            return future.result(timeout=self.budget)
+        except FutureTimeout:
+            count('provider_over_budget')
+            return None
+
+    def _forget(self, name, future):
+        with self._lock:
+            if self._inflight.get(name) is future:
+                del self._inflight[name]
+
+    def _fetch(self, name, key):
+        started = time.monotonic()
+        try:
+            response = self.session.get(self.url.format(name=quote(name)), timeout=self.timeout)
+            if response.status_code == 404:
+                record = None
+            else:
+                response.raise_for_status()
+                record = parse_provider_record(name, response.json())
+        # requests' errors derive from OSError, bad JSON from ValueError
+        except (OSError, ValueError) as e:
+            self.breaker.record(time.monotonic() - started, ok=False)
+            count('provider_error')
+            print(f"Nutrition provider error for {name!r}: {e}")
+            return None
+
+        self.breaker.record(time.monotonic() - started, ok=True)
+        count('provider_found' if record is not None else 'provider_unknown')
+        self.cache.put(key, {'record': record, 'checked_at': time.time()})
+        return record
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+def open_default_provider():
+    """
+    The provider at SCANEAT_NUTRITION_URL, or None when none is configured
+    """
+    return HTTPNutritionProvider(PROVIDER_URL, PROVIDER_KEY) if PROVIDER_URL else None
@@ -0,0 +1,103 @@
+"""
+Nutrition Records
+Immutable nutrition records shared by every session and cache
+"""
+import sys
+from collections.abc import Mapping
+
+# Numeric fields, in the column order used by tables and stores
+MACRO_FIELDS = ("calories", "protein", "carbs", "fat", "fiber", "sugar")
+
+RECORD_FIELDS = MACRO_FIELDS + ("vitamins", "minerals", "serving_size")
+
+# One tuple instance per distinct vitamin or mineral list
+_SHARED_NAMES = {}
+
+def shared_names(names):
+    """
+    Interned tuple of names; equal lists across records share one tuple
+    """
+    key = tuple(sys.intern(str(name)) for name in names)
+    return _SHARED_NAMES.setdefault(key, key)
+
+def json_default(value):
+    """
+    json.dumps default for pipeline results: NutritionRecord and other
+    read-only mappings become dicts, NumPy scalars (np.bool_, np.float64)
+    their Python values
+    """
+    if isinstance(value, Mapping):
+        return dict(value)
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+class NutritionRecord(Mapping):
+    """
+    Frozen nutrition record: float macros, shared interned name tuples and
+    no per-instance dict. It reads like the dict it replaces (record['fat'],
+    record.get('fiber'), dict(record)), so one instance can be handed to
+    every session and cache without defensive copies, and it hashes by
+    value for use as a cache key.
+    """
+    __slots__ = RECORD_FIELDS + ('_hash',)
+
+    def __init__(self, calories=0.0, protein=0.0, carbs=0.0, fat=0.0, fiber=0.0, sugar=0.0,
+                 vitamins=(), minerals=(), serving_size="1 serving"):
+        assign = object.__setattr__
+        for field, value in zip(MACRO_FIELDS, (calories, protein, carbs, fat, fiber, sugar)):
+            assign(self, field, float(value))
+        assign(self, 'vitamins', shared_names(vitamins))
+        assign(self, 'minerals', shared_names(minerals))
+        assign(self, 'serving_size', sys.intern(str(serving_size)))
+        assign(self, '_hash', None)
+
+    @classmethod
+    def from_mapping(cls, record):
+        """
+        Record from any mapping with the record fields (a plain dict, a
+        JSON-decoded cache entry); records are returned as they are
+        """
+        if isinstance(record, cls):
+            return record
+        return cls(**{field: record[field] for field in RECORD_FIELDS if field in record})
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"NutritionRecord is immutable; cannot set {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"NutritionRecord is immutable; cannot delete {name!r}")
+
+    def __getitem__(self, key):
+        if key not in RECORD_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in RECORD_FIELDS
+
+    def __iter__(self):
+        return iter(RECORD_FIELDS)
+
+    def __len__(self):
+        return len(RECORD_FIELDS)
+
+    def _values(self):
+        return tuple(getattr(self, field) for field in RECORD_FIELDS)
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash(self._values()))
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, NutritionRecord):
+            return self._values() == other._values()
+        return super().__eq__(other)
+
+    def __reduce__(self):
+        # Pickled by value for worker processes; __setattr__ is off limits
+        return NutritionRecord, self._values()
+
+    def __repr__(self):
+        return f"NutritionRecord({', '.join(f'{field}={self[field]!r}' for field in RECORD_FIELDS)})"
@@ -0,0 +1,352 @@
+"""
+Nutrition Store
+Indexed on-disk SQLite store for large nutrition datasets
+
+    python nutrition_store.py foods.csv more_foods.jsonl -o data/nutrition.db
+
+Dumps are streamed row by row into the store, so 100k+ foods never sit in
+memory. nutrition_api opens the store lazily when SCANEAT_NUTRITION_DB (or
+data/nutrition.db) exists. Records are read on demand through a small hot
+cache, so neither import time nor per-process memory grows with the dataset.
+
+Rows need a "name" (or "food_id") and the macro fields; "vitamins",
+"minerals" and "aliases" are lists (JSONL) or ";"-separated text (CSV).
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from food_search import trigrams
+from nutrition_record import MACRO_FIELDS, NutritionRecord
+
+DEFAULT_STORE = os.environ.get(
+    'SCANEAT_NUTRITION_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'nutrition.db'))
+
+# Rows written per transaction while ingesting
+INGEST_BATCH_SIZE = 5000
+
+# Names scored per fuzzy search. Postings are probed rarest first until this
+# many candidates are found, which bounds the cost on 100k+ names; a name
+# sharing only very common trigrams with the query can be missed.
+CANDIDATE_LIMIT = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS foods (
+    food_id TEXT PRIMARY KEY,
+    calories REAL, protein REAL, carbs REAL, fat REAL, fiber REAL, sugar REAL,
+    vitamins TEXT, minerals TEXT, serving_size TEXT
+);
+CREATE TABLE IF NOT EXISTS names (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    food_id TEXT NOT NULL,
+    canonical INTEGER NOT NULL,
+    grams INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS name_trigrams (
+    gram TEXT NOT NULL,
+    name_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, name_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS gram_counts (
+    gram TEXT PRIMARY KEY,
+    names INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+class NutritionStore:
+    """
+    Read side of the store. Each thread opens its own read-only connection
+    on first use; records pass through an LRU of hot entries. Fuzzy search
+    uses the same padded trigrams, Jaccard scores and prefix filtering as
+    food_search.TrigramIndex, with postings kept in an indexed table and
+    the candidate set capped at CANDIDATE_LIMIT.
+    """
+
+    def __init__(self, path=DEFAULT_STORE, cache_size=1024):
+        self.path = path
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.connection = connection
+        return connection
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+
+    def resolve(self, name):
+        """
+        Food ID for a normalized name or alias, or None if unknown
+        """
+        row = self._connection().execute(
+            "SELECT food_id FROM names WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, food_id):
+        """
+        Nutrition record for a food ID, or None if unknown
+        """
+        with self._lock:
+            record = self._cache.get(food_id)
+            if record is not None:
+                self._cache.move_to_end(food_id)
+                return record
+
+        row = self._connection().execute(
+            "SELECT calories, protein, carbs, fat, fiber, sugar, vitamins, minerals, serving_size "
+            "FROM foods WHERE food_id = ?", (food_id,)).fetchone()
+        if row is None:
+            return None
+        record = NutritionRecord(*row[:6], json.loads(row[6]), json.loads(row[7]), row[8])
+
+        with self._lock:
+            self._cache[food_id] = record
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return record
+
+    def search(self, name, threshold=0.45, limit=5):
+        """
+        Ranked fuzzy candidates for a normalized name, best name per food
+        Returns [(food_id, matched_name, score)]
+        """
+        query_grams = sorted(trigrams(name))
+        if not query_grams:
+            return []
+        connection = self._connection()
+        marks = ",".join("?" * len(query_grams))
+
+        # Probe only the rarest grams; see TrigramIndex.search
+        counts = dict(connection.execute(
+            f"SELECT gram, names FROM gram_counts WHERE gram IN ({marks})", query_grams))
+        needed = max(1, math.ceil(threshold * len(query_grams)))
+        probes = sorted(query_grams, key=lambda g: counts.get(g, 0))
+        probes = [g for g in probes[:len(query_grams) - needed + 1] if g in counts]
+        if not probes:
+            return []
+
+        # Rarest probes first, until enough candidates are collected
+        candidates = set()
+        for gram in probes:
+            remaining = CANDIDATE_LIMIT - len(candidates)
+            if remaining <= 0:
+                break
+            candidates.update(row[0] for row in connection.execute(
+                "SELECT name_id FROM name_trigrams WHERE gram = ? LIMIT ?", (gram, remaining)))
+
+        min_size = threshold * len(query_grams)
+        max_size = len(query_grams) / threshold if threshold > 0 else math.inf
+        candidates = sorted(candidates)
+        rows = connection.execute(f"""
+            SELECT names.name, names.food_id, names.grams, COUNT(*)
+            FROM name_trigrams JOIN names ON names.id = name_trigrams.name_id
+            WHERE name_trigrams.name_id IN ({",".join("?" * len(candidates))})
+              AND name_trigrams.gram IN ({marks})
+            GROUP BY name_trigrams.name_id
+        """, (*candidates, *query_grams)).fetchall()
+
+        matches = []
+        for matched_name, food_id, grams, shared in rows:
+            if not min_size <= grams <= max_size:
+                continue
+            score = shared / (len(query_grams) + grams - shared)
+            if score >= threshold:
+                matches.append((food_id, matched_name, score))
+        matches.sort(key=lambda m: (-m[2], m[1]))
+
+        candidates, seen = [], set()
+        for food_id, matched_name, score in matches:
+            if food_id not in seen:
+                seen.add(food_id)
+                candidates.append((food_id, matched_name, score))
+        return candidates[:limit]
+
+def open_default_store():
+    """
+    The store at DEFAULT_STORE, or None when none has been ingested
+    """
+    return NutritionStore(DEFAULT_STORE) if os.path.exists(DEFAULT_STORE) else None
+
+def _split_list(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value).replace("|", ";").split(";") if item.strip()]
+
+def iter_dump_rows(path):
+    """
+    Stream raw rows from a .csv or .jsonl dump; JSONL lines come back
+    undecoded so a malformed one fails in parse_row like any bad row
+    """
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson', '.json')):
+            for line in f:
+                if line.strip():
+                    yield line
+        else:
+            yield from csv.DictReader(f)
+
+def parse_row(row, normalize):
+    """
+    One dump row (a dict or a JSON line) as (food_id, record, aliases);
+    raises ValueError when the row isn't valid JSON, the name is missing
+    or a macro isn't a number
+    """
+    if isinstance(row, str):
+        row = json.loads(row)
+    food_id = normalize(str(row.get('food_id') or row.get('name') or ""))
+    if not food_id:
+        raise ValueError("row has no name")
+    record = NutritionRecord(*(float(row.get(field) or 0) for field in MACRO_FIELDS),
+                             _split_list(row.get('vitamins')), _split_list(row.get('minerals')),
+                             row.get('serving_size') or "1 serving")
+    aliases = [normalize(alias) for alias in _split_list(row.get('aliases'))]
+    return food_id, record, aliases
+
+class StoreWriter:
+    """
+    Bulk loader: foods and names are written in large transactions, and the
+    trigram postings are built in one pass once every name is known
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.executescript(SCHEMA)
+        self._foods = []
+        self._names = []
+
+    def add(self, food_id, record, aliases=()):
+        self._foods.append((food_id, *(record[field] for field in MACRO_FIELDS),
+                            json.dumps(record['vitamins']), json.dumps(record['minerals']),
+                            record['serving_size']))
+        self._names.append((food_id, food_id, 1))
+        self._names.extend((alias, food_id, 0) for alias in aliases if alias)
+        if len(self._foods) >= INGEST_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO foods VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._foods)
+            # Canonical names replace aliases; aliases never replace anything
+            self.connection.executemany(
+                "INSERT INTO names (name, food_id, canonical, grams) VALUES (?, ?, ?, 0) "
+                "ON CONFLICT (name) DO UPDATE SET food_id = excluded.food_id, canonical = 1 "
+                "WHERE excluded.canonical = 1", self._names)
+        self._foods.clear()
+        self._names.clear()
+
+    def close(self):
+        """
+        Flush, rebuild the trigram postings and compact the file
+        """
+        self.flush()
+        with self.connection:
+            self.connection.execute("DELETE FROM name_trigrams")
+            self.connection.execute("DELETE FROM gram_counts")
+            reader = self.connection.cursor()
+            reader.execute("SELECT id, name FROM names")
+            while True:
+                batch = reader.fetchmany(INGEST_BATCH_SIZE)
+                if not batch:
+                    break
+                postings, sizes = [], []
+                for name_id, name in batch:
+                    grams = trigrams(name)
+                    postings.extend((gram, name_id) for gram in grams)
+                    sizes.append((len(grams), name_id))
+                self.connection.executemany("INSERT INTO name_trigrams VALUES (?, ?)", postings)
+                self.connection.executemany("UPDATE names SET grams = ? WHERE id = ?", sizes)
+            self.connection.execute(
+                "INSERT INTO gram_counts SELECT gram, COUNT(*) FROM name_trigrams GROUP BY gram")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS name_trigrams_by_name ON name_trigrams (name_id, gram)")
+        self.connection.execute("PRAGMA journal_mode = DELETE")
+        self.connection.execute("VACUUM")
+        self.connection.close()
+
+def _remove_store(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def ingest(paths, output_path, builtin=True, log=sys.stderr):
+    """
+    Stream dumps into the store at output_path; returns (foods, skipped)
+
+    The store is built in a temporary file next to output_path and only
+    renamed into place once it is complete, so a failed run leaves the
+    previous store (or none) rather than a partial one.
+    """
+    from nutrition_api import ALIAS_INDEX, NUTRITION_DATABASE, normalize_food_name
+
+    temp_path = output_path + ".tmp"
+    _remove_store(temp_path)
+    if os.path.exists(output_path):
+        # Updating: start from a copy of the current store
+        shutil.copyfile(output_path, temp_path)
+
+    writer = StoreWriter(temp_path)
+    foods = skipped = 0
+    started = time.perf_counter()
+    try:
+        if builtin:
+            builtin_aliases = {}
+            for name, food_id in ALIAS_INDEX.items():
+                builtin_aliases.setdefault(food_id, []).append(name)
+            for food_id, record in NUTRITION_DATABASE.items():
+                writer.add(food_id, record, builtin_aliases.get(food_id, ()))
+
+        for path in paths:
+            for row_number, row in enumerate(iter_dump_rows(path), 1):
+                try:
+                    writer.add(*parse_row(row, normalize_food_name))
+                    foods += 1
+                except (ValueError, TypeError, AttributeError) as e:
+                    skipped += 1
+                    if log:
+                        print(f"{path}: row {row_number} skipped ({e})", file=log)
+                if log and foods and foods % 100000 == 0:
+                    print(f"{foods} foods ingested", file=log)
+        writer.close()
+    except BaseException:
+        writer.connection.close()
+        _remove_store(temp_path)
+        raise
+    os.replace(temp_path, output_path)
+
+    if log:
+        print(f"Ingested {foods} foods ({skipped} skipped) into {output_path} "
+              f"in {time.perf_counter() - started:.1f}s", file=log)
+    return foods, skipped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream nutrition dumps (CSV or JSONL) into the nutrition store")
+    parser.add_argument('dumps', nargs='+', help=".csv or .jsonl files")
+    parser.add_argument('-o', '--output', default=DEFAULT_STORE, help="store file to create or update")
+    parser.add_argument('--no-builtin', action='store_true',
+                        help="don't copy the built-in foods and aliases into the store")
+    args = parser.parse_args(argv)
+    ingest(args.dumps, args.output, builtin=not args.no_builtin)
+
+if __name__ == '__main__':
+    main()
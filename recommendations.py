@@ -4,6 +4,12 @@ Provides personalized food recommendations
 """
 
 import random
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import count, timed
+from nutrition_api import MACRO_FIELDS, NUTRITION_TABLE, lookup_food
 
 # Meal recommendations database
 MEAL_RECOMMENDATIONS = {
@@ -37,10 +43,110 @@ MEAL_RECOMMENDATIONS = {
     }
 }
 
-def get_meal_recommendation(meal_time, current_food, user_goal, nutrition_data):
+# Meal times each catalogue food suits; untagged foods suit any meal
+MEAL_TIME_TAGS = {
+    "rice": ["Lunch", "Dinner"],
+    "dal tadka": ["Lunch", "Dinner"],
+    "roti": ["Lunch", "Dinner"],
+    "paneer butter masala": ["Lunch", "Dinner"],
+    "paneer tikka": ["Lunch", "Dinner", "Late Night Snack"],
+    "palak paneer": ["Lunch", "Dinner"],
+    "chicken curry": ["Lunch", "Dinner"],
+    "chicken biryani": ["Lunch", "Dinner"],
+    "veg biryani": ["Lunch", "Dinner"],
+    "biryani": ["Lunch", "Dinner"],
+    "samosa": ["Breakfast", "Late Night Snack"],
+    "dosa": ["Breakfast", "Dinner"],
+    "plain dosa": ["Breakfast", "Dinner"],
+    "idli": ["Breakfast", "Dinner", "Late Night Snack"],
+    "chole": ["Lunch", "Dinner"],
+    "rajma": ["Lunch", "Dinner"],
+}
+
+# Relative weight of each macro in the distance, in MACRO_FIELDS order
+MACRO_WEIGHTS = np.array([2.0, 1.5, 1.0, 1.0, 0.5, 0.5])
+
+# Where each goal moves the query, in standard deviations per macro
+GOAL_SHIFTS = {
+    "weight_loss": np.array([-1.0, 0.0, -0.5, -0.5, 0.3, -0.3]),
+    "weight_gain": np.array([1.0, 0.5, 0.5, 0.3, 0.0, 0.0]),
+    "healthy": np.array([0.0, 0.2, 0.0, -0.3, 0.3, -0.3]),
+}
+
+class AlternativeIndex:
+    """
+    k-nearest-neighbour index over normalized macro vectors of every
+    catalogue food, with a precomputed row mask per meal time
+    """
+
+    def __init__(self, table, meal_time_tags):
+        self.table = table
+        macros = table.macros.astype(np.float64)
+        self.scale = macros.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        self.vectors = macros / self.scale * MACRO_WEIGHTS
+
+        untagged = np.array([food_id not in meal_time_tags for food_id in table.food_ids])
+        meal_times = {t for tags in meal_time_tags.values() for t in tags}
+        self.meal_masks = {
+            meal_time: untagged | np.array([meal_time in meal_time_tags.get(food_id, ())
+                                            for food_id in table.food_ids])
+            for meal_time in meal_times
+        }
+
+    def query(self, nutrition_data, goal_key, meal_time=None, exclude=None, k=3):
+        """
+        Up to k catalogue foods nearest to the goal-shifted macros of
+        nutrition_data, best first. Ties resolve by table order, so the
+        answer is deterministic.
+        """
+        current = np.array([nutrition_data.get(field, 0) for field in MACRO_FIELDS], dtype=np.float64)
+        target = (current / self.scale + GOAL_SHIFTS.get(goal_key, 0)) * MACRO_WEIGHTS
+
+        mask = self.meal_masks.get(meal_time, np.ones(len(self.table), dtype=bool)).copy()
+        if exclude in self.table.row_index:
+            mask[self.table.row_index[exclude]] = False
+
+        # Alternatives must move calories in the goal's direction
+        calories = self.table.column("calories")
+        if goal_key == "weight_loss":
+            mask &= calories < current[0]
+        elif goal_key == "weight_gain":
+            mask &= calories > current[0]
+
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
+            return []
+        distances = np.linalg.norm(self.vectors[rows] - target, axis=1)
+        if len(rows) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+            rows, distances = rows[nearest], distances[nearest]
+        order = np.lexsort((rows, distances))
+        return [self.table.food_ids[i] for i in rows[order]]
+
+ALTERNATIVE_INDEX = AlternativeIndex(NUTRITION_TABLE, MEAL_TIME_TAGS)
+
+def find_alternatives(meal_time, current_food, goal_key, nutrition_data, k=3):
+    """
+    Catalogue foods closest to the current meal, shifted toward the goal
+    """
+    food_id = lookup_food(current_food)['food_id']
+    return ALTERNATIVE_INDEX.query(nutrition_data, goal_key, meal_time, exclude=food_id, k=k)
+
+def _fallback_alternatives(meal_time, goal_key, rng):
+    # Hand-written suggestions, used only when the catalogue has no match
+    options = MEAL_RECOMMENDATIONS.get(meal_time, {}).get(goal_key, [])
+    return rng.sample(options, min(3, len(options)))
+
+@timed('recommendation')
+def get_meal_recommendation(meal_time, current_food, user_goal, nutrition_data, rng=None):
     """
     Generate personalized meal recommendations
+    rng: random.Random used for fallback suggestions; a fixed seed by default
     """
+    if rng is None:
+        rng = random.Random(0)
+
     recommendations = {
         "message": "",
         "alternatives": [],
@@ -65,19 +171,18 @@ def get_meal_recommendation(meal_time, current_food, user_goal, nutrition_data):
     # Generate message based on analysis
     if user_goal == "Lose Weight":
         if calories > 400:
-            recommendations["message"] = f"⚠️ This meal is quite calorie-dense ({calories} kcal). For weight loss, consider lighter alternatives."
-            if meal_time in MEAL_RECOMMENDATIONS:
-                recommendations["alternatives"] = random.sample(
-                    MEAL_RECOMMENDATIONS[meal_time].get("weight_loss", []), 
-                    min(3, len(MEAL_RECOMMENDATIONS[meal_time].get("weight_loss", [])))
-                )
+            recommendations["message"] = f"⚠️ This meal is quite calorie-dense ({calories:g} kcal). For weight loss, consider lighter alternatives."
+            recommendations["alternatives"] = (
+                find_alternatives(meal_time, current_food, "weight_loss", nutrition_data)
+                or _fallback_alternatives(meal_time, "weight_loss", rng)
+            )
             recommendations["tips"] = [
                 "Aim for 300-400 calories per meal for weight loss",
                 "Include more vegetables and lean proteins",
                 "Avoid fried and heavy foods"
             ]
         else:
-            recommendations["message"] = f"✅ Good choice! At {calories} kcal, this aligns well with your weight loss goal."
+            recommendations["message"] = f"✅ Good choice! At {calories:g} kcal, this aligns well with your weight loss goal."
             recommendations["tips"] = [
                 "Maintain portion control for best results",
                 "Stay hydrated throughout the day"
@@ -85,18 +190,17 @@ def get_meal_recommendation(meal_time, current_food, user_goal, nutrition_data):
 
     elif user_goal == "Gain Weight":
         if calories < 400:
-            recommendations["message"] = f"💪 This meal has {calories} kcal. Consider adding calorie-dense foods to reach your weight gain goal."
-            if meal_time in MEAL_RECOMMENDATIONS:
-                recommendations["alternatives"] = random.sample(
-                    MEAL_RECOMMENDATIONS[meal_time].get("weight_gain", []), 
-                    min(3, len(MEAL_RECOMMENDATIONS[meal_time].get("weight_gain", [])))
-                )
+            recommendations["message"] = f"💪 This meal has {calories:g} kcal. Consider adding calorie-dense foods to reach your weight gain goal."
+            recommendations["alternatives"] = (
+                find_alternatives(meal_time, current_food, "weight_gain", nutrition_data)
+                or _fallback_alternatives(meal_time, "weight_gain", rng)
+            )
             recommendations["tips"] = [
                 "Aim for 500-600 calories per meal for weight gain",
                 "Include healthy fats and proteins"
             ]
         else:
-            recommendations["message"] = f"✅ Excellent! At {calories} kcal with {protein}g protein, this supports your weight gain goal."
+            recommendations["message"] = f"✅ Excellent! At {calories:g} kcal with {protein:g}g protein, this supports your weight gain goal."
             recommendations["tips"] = [
                 "Great choice for building muscle mass",
                 "Stay consistent with your meal plan"
@@ -104,18 +208,17 @@ def get_meal_recommendation(meal_time, current_food, user_goal, nutrition_data):
 
     else:  # Maintain Weight
         if 250 <= calories <= 450:
-            recommendations["message"] = f"✅ Perfect balance! This {calories} kcal meal is ideal for maintaining your weight."
+            recommendations["message"] = f"✅ Perfect balance! This {calories:g} kcal meal is ideal for maintaining your weight."
             recommendations["tips"] = [
                 "Well-balanced meal for your goals",
                 "Stay active and hydrated"
             ]
         else:
-            recommendations["message"] = f"ℹ️ This meal has {calories} kcal. For weight maintenance, aim for balanced meals."
-            if meal_time in MEAL_RECOMMENDATIONS:
-                recommendations["alternatives"] = random.sample(
-                    MEAL_RECOMMENDATIONS[meal_time].get("healthy", []), 
-                    min(3, len(MEAL_RECOMMENDATIONS[meal_time].get("healthy", [])))
-                )
+            recommendations["message"] = f"ℹ️ This meal has {calories:g} kcal. For weight maintenance, aim for balanced meals."
+            recommendations["alternatives"] = (
+                find_alternatives(meal_time, current_food, "healthy", nutrition_data)
+                or _fallback_alternatives(meal_time, "healthy", rng)
+            )
 
     # Add nutrition-specific tips
     if protein > 25:
@@ -132,3 +235,45 @@ def get_meal_recommendation(meal_time, current_food, user_goal, nutrition_data):
         ]
 
     return recommendations
+
+def nutrition_key(nutrition_data):
+    """
+    Hashable fingerprint of the values a recommendation depends on
+    """
+    return tuple(nutrition_data.get(field, 0) for field in MACRO_FIELDS)
+
+class RecommendationMemo:
+    """
+    Per-session memo of recommendations keyed by the arguments as given
+    (meal time, food name, goal, nutrition fingerprint), so a rerun costs
+    one dict lookup. Each answer draws from its own RNG seeded from the
+    session seed and the canonical food ID, so answers are stable across
+    reruns, the same for aliases, independent of call order and never
+    touch the shared global random state.
+    """
+
+    def __init__(self, seed=None, max_entries=64):
+        self.seed = random.SystemRandom().randrange(2 ** 32) if seed is None else seed
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+
+    def get(self, meal_time, current_food, user_goal, nutrition_data):
+        """
+        Memoized get_meal_recommendation; treat the result as read-only
+        """
+        fingerprint = nutrition_key(nutrition_data)
+        key = (meal_time, current_food, user_goal, fingerprint)
+
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            count('recommendation_memo_hit')
+            return result
+
+        food_id = lookup_food(current_food)['food_id'] or current_food
+        rng = random.Random(f"{self.seed}:{(meal_time, food_id, user_goal, fingerprint)!r}")
+        result = get_meal_recommendation(meal_time, current_food, user_goal, nutrition_data, rng)
+        self._results[key] = result
+        if len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        return result
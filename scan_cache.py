@@ -0,0 +1,135 @@
+"""
+Recognition Result Cache
+Content-addressed, two-tier cache for analyzed uploads
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import count
+from nutrition_record import json_default
+
+def content_key(image_bytes):
+    """
+    Hash the raw uploaded bytes; identical uploads share one key
+    """
+    return hashlib.blake2b(image_bytes, digest_size=20).hexdigest()
+
+class RecognitionCache:
+    """
+    In-memory LRU with size and TTL limits, backed by an optional on-disk
+    tier that survives restarts. Entries are plain dicts holding the
+    validation verdict, the recognition result and the nutrition record.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=24 * 3600, disk_dir=None, event_prefix='cache'):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        # Metrics events are <event_prefix>_hit, _disk_hit and _miss
+        self.event_prefix = event_prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return the cached entry for key, or None
+        """
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                stored_at, entry = item
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    count(f'{self.event_prefix}_hit')
+                    return entry
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                count(f'{self.event_prefix}_miss')
+                return None
+            self.disk_hits += 1
+            count(f'{self.event_prefix}_disk_hit')
+            self._remember(key, entry, now)
+        return entry
+
+    def put(self, key, entry):
+        """
+        Store an entry in memory and, when configured, on disk
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, entry, now)
+        self._write_disk(key, entry, now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Hit/miss counters and current in-memory size
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'size': len(self._entries),
+            }
+
+    def _remember(self, key, entry, stored_at):
+        self._entries[key] = (stored_at, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + '.json')
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - record.get('stored_at', 0) > self.ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record['entry']
+
+    def _write_disk(self, key, entry, stored_at):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'stored_at': stored_at, 'entry': entry}, f, default=json_default)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            print(f"Cache write error: {e}")
+
+# Process-wide cache shared by every session; set SCANEAT_CACHE_DIR for the disk tier
+RESULT_CACHE = RecognitionCache(disk_dir=os.environ.get('SCANEAT_CACHE_DIR'))
@@ -0,0 +1,255 @@
+"""
+Scan History
+Persistent log of eaten scans with per-day rollups for trend queries
+
+Entries are queued by the request path and written in batches by one
+background thread, so logging a meal never waits on the disk. Each batch
+also adds to a per-user, per-day rollup in the same transaction; daily,
+weekly and monthly totals and the sidebar trend read only rollup rows
+through their primary key, never the raw log.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from metrics import count
+from nutrition_record import MACRO_FIELDS
+
+DEFAULT_HISTORY = os.environ.get(
+    'SCANEAT_HISTORY_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'history.db'))
+
+# Most entries written per transaction
+WRITE_BATCH_SIZE = 256
+
+# Entries waiting for the writer; beyond this new ones are dropped
+MAX_PENDING = 10000
+
+# Days shown by the sidebar trend
+TREND_DAYS = 90
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    food_id TEXT,
+    food_name TEXT NOT NULL,
+    confidence REAL,
+    portion REAL NOT NULL,
+    calories REAL, protein REAL, carbs REAL, fat REAL, fiber REAL, sugar REAL
+);
+CREATE INDEX IF NOT EXISTS scans_by_user ON scans (user_id, scanned_at);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    scans INTEGER NOT NULL,
+    calories REAL, protein REAL, carbs REAL, fat REAL, fiber REAL, sugar REAL,
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+"""
+
+_INSERT_SCAN = (
+    "INSERT INTO scans (user_id, scanned_at, day, food_id, food_name, confidence, portion, "
+    f"{', '.join(MACRO_FIELDS)}) VALUES ({', '.join('?' * (7 + len(MACRO_FIELDS)))})")
+
+_ADD_TO_DAY = (
+    f"INSERT INTO daily_totals VALUES (?, ?, 1, {', '.join('?' * len(MACRO_FIELDS))}) "
+    "ON CONFLICT (user_id, day) DO UPDATE SET scans = scans + 1, "
+    + ", ".join(f"{field} = {field} + excluded.{field}" for field in MACRO_FIELDS))
+
+_FIND_SCAN = (
+    f"SELECT id, day, {', '.join(MACRO_FIELDS)} FROM scans WHERE user_id = ? AND scanned_at = ?")
+
+_SUBTRACT_FROM_DAY = (
+    "UPDATE daily_totals SET scans = scans - 1, "
+    + ", ".join(f"{field} = {field} - ?" for field in MACRO_FIELDS)
+    + " WHERE user_id = ? AND day = ?")
+
+# Rollup rows are grouped into weeks (starting Monday) and months by key
+_PERIOD_KEYS = {
+    'day': "day",
+    'week': "date(day, '-' || ((strftime('%w', day) + 6) % 7) || ' days')",
+    'month': "substr(day, 1, 7)"
+}
+
+class ScanHistory:
+    """
+    WAL-mode SQLite log shared by every session in the process. record()
+    and remove() only enqueue; a daemon thread owns the write connection
+    and applies both in queue order, and each reading thread opens its
+    own connection, which WAL lets run alongside the writer.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY):
+        self.path = path
+        self._pending = queue.Queue(MAX_PENDING)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writer = None
+        self.dropped = 0
+        self._last_scanned_at = 0.0
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode = WAL")
+        # WAL stays consistent with NORMAL; a crash can lose only the last batch
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def record(self, user_id, food_name, macros, portion=1.0, food_id=None, confidence=None,
+               scanned_at=None):
+        """
+        Queue one eaten scan; macros are the totals for the given portion.
+        Returns its scanned_at, which remove() takes. Never blocks: returns
+        None (and drops the entry) when the writer is too far behind.
+        """
+        if scanned_at is None:
+            # Distinct per scan even on coarse clocks, since it keys remove()
+            with self._lock:
+                scanned_at = self._last_scanned_at = max(time.time(), self._last_scanned_at + 1e-6)
+        entry = (user_id, scanned_at, date.fromtimestamp(scanned_at).isoformat(), food_id,
+                 food_name, confidence, float(portion),
+                 *(float(macros.get(field) or 0) for field in MACRO_FIELDS))
+        return scanned_at if self._enqueue('add', entry) else None
+
+    def remove(self, user_id, scanned_at):
+        """
+        Queue the removal of a recorded scan (a meal logged by mistake);
+        its row goes and its day's rollup is reduced in one transaction
+        """
+        return self._enqueue('remove', (user_id, scanned_at))
+
+    def _enqueue(self, kind, entry):
+        self._start_writer()
+        try:
+            self._pending.put_nowait((kind, entry))
+        except queue.Full:
+            self.dropped += 1
+            count('history_dropped')
+            return False
+        return True
+
+    def flush(self):
+        """
+        Wait until every queued entry has been written
+        """
+        if self._writer is not None:
+            self._pending.join()
+
+    def _start_writer(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='scan-history',
+                                                daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        connection = self._connect()
+        while True:
+            # Block for the first entry, then take whatever else is waiting
+            batch = [self._pending.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with connection:
+                    self._apply(connection, batch)
+                count('history_written', len(batch))
+            except sqlite3.Error as e:
+                print(f"History write error: {e}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    @staticmethod
+    def _apply(connection, batch):
+        # Runs of additions are written with executemany; order is kept so
+        # a removal always sees the scan queued before it
+        start = 0
+        while start < len(batch):
+            if batch[start][0] == 'add':
+                end = start
+                while end < len(batch) and batch[end][0] == 'add':
+                    end += 1
+                entries = [entry for _, entry in batch[start:end]]
+                connection.executemany(_INSERT_SCAN, entries)
+                connection.executemany(_ADD_TO_DAY, [(e[0], e[2], *e[7:]) for e in entries])
+                start = end
+                continue
+
+            user_id, scanned_at = batch[start][1]
+            row = connection.execute(_FIND_SCAN, (user_id, scanned_at)).fetchone()
+            if row is not None:
+                scan_id, day, *macros = row
+                connection.execute("DELETE FROM scans WHERE id = ?", (scan_id,))
+                connection.execute(_SUBTRACT_FROM_DAY, (*macros, user_id, day))
+                connection.execute("DELETE FROM daily_totals WHERE user_id = ? AND day = ? "
+                                   "AND scans <= 0", (user_id, day))
+            start += 1
+
+    def recent(self, user_id, limit=20):
+        """
+        Latest scans, newest first
+        Returns [{'scanned_at', 'food_id', 'food_name', 'confidence', 'portion', 'macros'}]
+        """
+        rows = self._connection().execute(
+            f"SELECT scanned_at, food_id, food_name, confidence, portion, {', '.join(MACRO_FIELDS)} "
+            "FROM scans WHERE user_id = ? ORDER BY scanned_at DESC LIMIT ?", (user_id, limit))
+        return [{
+            'scanned_at': row[0],
+            'food_id': row[1],
+            'food_name': row[2],
+            'confidence': row[3],
+            'portion': row[4],
+            'macros': dict(zip(MACRO_FIELDS, row[5:]))
+        } for row in rows]
+
+    def totals(self, user_id, start, end, period='day'):
+        """
+        Summed macros per day, week (keyed by its Monday) or month
+        ("YYYY-MM") for start <= day <= end, from the daily rollup
+        Returns [{'period', 'scans', **macros}] oldest first
+        """
+        key = _PERIOD_KEYS[period]
+        rows = self._connection().execute(
+            f"SELECT {key} AS period, SUM(scans), "
+            f"{', '.join(f'SUM({field})' for field in MACRO_FIELDS)} FROM daily_totals "
+            "WHERE user_id = ? AND day BETWEEN ? AND ? GROUP BY period ORDER BY period",
+            (user_id, start.isoformat(), end.isoformat()))
+        return [{'period': row[0], 'scans': row[1], **dict(zip(MACRO_FIELDS, row[2:]))}
+                for row in rows]
+
+    def trend(self, user_id, days=TREND_DAYS, today=None):
+        """
+        Calories per day for the last days days, ending today; days without
+        scans are 0. Returns (dates, calories)
+        """
+        today = today or date.today()
+        start = today - timedelta(days=days - 1)
+        calories = dict(self._connection().execute(
+            "SELECT day, calories FROM daily_totals WHERE user_id = ? AND day BETWEEN ? AND ?",
+            (user_id, start.isoformat(), today.isoformat())))
+        dates = [start + timedelta(days=i) for i in range(days)]
+        return dates, [calories.get(day.isoformat(), 0.0) for day in dates]
+
+# Process-wide history; set SCANEAT_HISTORY_DB to move it. Nothing is
+# opened until the first read or write.
+SCAN_HISTORY = ScanHistory()
@@ -0,0 +1,310 @@
+"""
+Headless Inference Server
+Asyncio HTTP/1.1 JSON API over the recognition + nutrition pipeline
+
+Endpoints:
+    GET  /health
+    POST /validate      image body -> validation verdict
+    POST /recognize     image body -> recognition result
+    POST /analyze       image body -> verdict, recognition and nutrition
+    GET  /nutrition?name=<food>
+    POST /recommend     JSON {"meal_time", "food", "goal", "nutrition"?}
+
+Images are sent as a raw body (image/jpeg, image/png,
+application/octet-stream) or as multipart/form-data with an "image" field.
+Decoding and NumPy work run in a bounded process pool, so the event loop
+never blocks and throughput scales with cores. Uploads over
+MAX_UPLOAD_BYTES get a 413, images over MAX_IMAGE_PIXELS a 422.
+"""
+import argparse
+import asyncio
+import email.parser
+import email.policy
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+from image_preprocessing import DECODE_ERRORS, ImageTooLarge
+from nutrition_record import MACRO_FIELDS, json_default
+
+# Request limits
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_JSON_BYTES = 64 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+
+# Seconds a request may wait for a free worker before getting a 503
+QUEUE_TIMEOUT = 10.0
+
+# Seconds an idle keep-alive connection stays open
+IDLE_TIMEOUT = 30.0
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# Worker processes: each one builds its own engine once
+_worker_engine = None
+
+def _init_worker():
+    global _worker_engine
+    from engine import ScanEngine
+    _worker_engine = ScanEngine()
+
+def _warm_worker():
+    return os.getpid()
+
+def _run_image_task(task, image_bytes):
+    engine = _worker_engine
+    if task == 'analyze':
+        return engine.analyze_upload(image_bytes)
+
+    if task == 'validate':
+        screening = engine.screen(image_bytes)
+        return {'is_food': screening['is_food'], 'confidence': screening['confidence'],
+                'level': screening['level']}
+    return engine.recognize(engine.extract_features(image_bytes))
+
+def _recommend_request(body):
+    """
+    Validated /recommend fields; raises a 400 HTTPError on bad input
+    """
+    try:
+        request = json.loads(body or b'{}')
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, 'Body is not valid JSON')
+    if not isinstance(request, dict) or not isinstance(request.get('food'), str):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, 'Expected JSON with at least "food"')
+
+    fields = {'food': request['food'],
+              'meal_time': request.get('meal_time', 'Lunch'),
+              'goal': request.get('goal', 'Maintain Weight')}
+    for key in ('meal_time', 'goal'):
+        if not isinstance(fields[key], str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'"{key}" must be a string')
+
+    nutrition = request.get('nutrition')
+    if nutrition is not None:
+        if not isinstance(nutrition, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, '"nutrition" must be an object')
+        for field in MACRO_FIELDS:
+            value = nutrition.get(field, 0)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f'"nutrition.{field}" must be a number')
+    fields['nutrition'] = nutrition
+    return fields
+
+class InferenceServer:
+    """
+    Routes HTTP requests; image work goes to a process pool with at most
+    two requests per worker queued or running at once
+    """
+
+    def __init__(self, workers=None, max_upload_bytes=MAX_UPLOAD_BYTES):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_upload_bytes = max_upload_bytes
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self.slots = asyncio.Semaphore(self.workers * 2)
+        self._engine = None
+
+    async def start(self):
+        """
+        Fork every worker, then build the in-process engine, all before
+        any connection is accepted: workers forked later would inherit the
+        listening socket and open client connections
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_worker)
+                               for _ in range(self.workers)))
+        from engine import ScanEngine
+        self._engine = await asyncio.to_thread(ScanEngine)
+
+    @property
+    def engine(self):
+        # Cheap lookups run in-process; built by start()
+        return self._engine
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                        {'error': 'Headers too large'}, keep_alive=False)
+                    break
+
+                keep_alive = await self._handle_request(head, reader, writer)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _handle_request(self, head, reader, writer):
+        try:
+            request_line, *header_lines = head.decode('latin-1').split('\r\n')
+            method, target, version = request_line.split(' ', 2)
+        except ValueError:
+            await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'Malformed request'},
+                                keep_alive=False)
+            return False
+
+        headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        try:
+            body = await self._read_body(method, headers, reader)
+            status, payload = HTTPStatus.OK, await self._route(method, target, headers, body)
+        except HTTPError as e:
+            status, payload = e.status, {'error': e.message}
+            # An unread body would corrupt the next request on this connection
+            if status in (HTTPStatus.REQUEST_ENTITY_TOO_LARGE, HTTPStatus.LENGTH_REQUIRED):
+                keep_alive = False
+        except Exception as e:
+            print(f"Request error: {e}")
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'Internal error'}
+
+        await self._respond(writer, status, payload, keep_alive)
+        return keep_alive
+
+    async def _read_body(self, method, headers, reader):
+        if method != 'POST':
+            return b''
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, 'Chunked uploads are not supported')
+        try:
+            length = int(headers['content-length'])
+        except (KeyError, ValueError):
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, 'Content-Length required')
+        if length > self.max_upload_bytes:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            f"Upload exceeds {self.max_upload_bytes} bytes")
+        return await reader.readexactly(length)
+
+    async def _route(self, method, target, headers, body):
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+
+        if path == '/health' and method == 'GET':
+            return {'status': 'ok', 'workers': self.workers}
+
+        if path in ('/validate', '/recognize', '/analyze'):
+            if method != 'POST':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, 'Use POST')
+            return await self._run_in_pool(path[1:], self._image_bytes(headers, body))
+
+        if path == '/nutrition' and method == 'GET':
+            name = parse_qs(url.query).get('name', [''])[0].strip()
+            if not name:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, 'Missing name parameter')
+            # Misses may wait on the external provider; keep the loop free
+            match = await asyncio.to_thread(self.engine.lookup_food, name)
+            return dict(match, nutrition=await asyncio.to_thread(self.engine.nutrition, name, match))
+
+        if path == '/recommend' and method == 'POST':
+            if len(body) > MAX_JSON_BYTES:
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'JSON body too large')
+            request = _recommend_request(body)
+            nutrition = request['nutrition'] or await asyncio.to_thread(
+                self.engine.nutrition, request['food'])
+            return await asyncio.to_thread(self.engine.recommend, request['meal_time'],
+                                           request['food'], request['goal'], nutrition)
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, 'Unknown endpoint')
+
+    def _image_bytes(self, headers, body):
+        content_type = headers.get('content-type', 'application/octet-stream')
+        if not content_type.lower().startswith('multipart/form-data'):
+            if not body:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, 'Empty image body')
+            return body
+
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+        parts = list(message.iter_parts()) if message.is_multipart() else []
+        for part in parts:
+            if part.get_param('name', header='content-disposition') == 'image':
+                return part.get_payload(decode=True)
+        for part in parts:
+            if part.get_filename():
+                return part.get_payload(decode=True)
+        raise HTTPError(HTTPStatus.BAD_REQUEST, 'No "image" field in form data')
+
+    async def _run_in_pool(self, task, image_bytes):
+        try:
+            await asyncio.wait_for(self.slots.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, 'Server busy, retry later')
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, _run_image_task, task, image_bytes)
+        except (ImageTooLarge, Image.DecompressionBombError) as e:
+            raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, f"Image too large ({e})")
+        except DECODE_ERRORS as e:
+            # PIL raises these for truncated or unsupported images
+            raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY,
+                            f"Could not decode image ({type(e).__name__})")
+        finally:
+            self.slots.release()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=json_default).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+async def serve(host='127.0.0.1', port=8080, workers=None, max_upload_bytes=MAX_UPLOAD_BYTES):
+    app = InferenceServer(workers, max_upload_bytes)
+    await app.start()
+    server = await asyncio.start_server(app.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    print(f"ScanEat inference server on http://{host}:{port} ({app.workers} workers)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        app.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the ScanEat pipeline over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument('--max-upload-mb', type=float, default=MAX_UPLOAD_BYTES / (1024 * 1024))
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers,
+                          int(args.max_upload_mb * 1024 * 1024)))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Fuzzy food name resolution: misspellings resolve, other dishes don't
+"""
+import pytest
+
+from food_search import same_words
+from nutrition_api import lookup_food
+
+@pytest.mark.parametrize("name, food_id", [
+    ("biriyani", "biryani"),
+    ("chiken curry", "chicken curry"),
+    ("palak paner", "palak paneer"),
+    ("paneer tika", "paneer tikka"),
+    ("masla dosa", "dosa"),
+    ("samosaa", "samosa"),
+])
+def test_misspellings_resolve(name, food_id):
+    match = lookup_food(name)
+    assert match['method'] == 'fuzzy'
+    assert match['food_id'] == food_id
+
+@pytest.mark.parametrize("name", [
+    "masala chai",   # shares "masala" with chana masala
+    "curry",         # generic recognizer label, not murgh curry
+    "mixed curry",
+    "lemon rice",    # different dishes, not plain rice
+    "curd rice",
+])
+def test_different_dishes_do_not_resolve(name):
+    match = lookup_food(name)
+    assert match['method'] in ('default', 'provider')
+    assert match['food_id'] is None
+
+def test_same_words():
+    assert same_words("tikka paneer", "paneer tikka")
+    assert not same_words("chai", "chana")
+    assert not same_words("curry", "murgh curry")
@@ -0,0 +1,25 @@
+"""
+Oversized images are refused before they are decoded
+"""
+import io
+
+import pytest
+from PIL import Image
+
+import image_preprocessing
+from image_preprocessing import DECODE_ERRORS, ImageTooLarge, load_image
+
+def png_bytes(size):
+    buffer = io.BytesIO()
+    Image.new('RGB', size).save(buffer, 'PNG')
+    return io.BytesIO(buffer.getvalue())
+
+def test_images_over_the_pixel_cap_are_refused(monkeypatch):
+    monkeypatch.setattr(image_preprocessing, 'MAX_IMAGE_PIXELS', 100 * 100)
+    assert load_image(png_bytes((100, 100))).size == (100, 100)
+    with pytest.raises(ImageTooLarge):
+        load_image(png_bytes((101, 100)))
+
+def test_decompression_bombs_are_decode_errors():
+    assert issubclass(ImageTooLarge, DECODE_ERRORS)
+    assert issubclass(Image.DecompressionBombError, DECODE_ERRORS)
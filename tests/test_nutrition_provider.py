@@ -0,0 +1,139 @@
+"""
+HTTPNutritionProvider against a local stub server
+"""
+import json
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip('requests')
+
+from nutrition_provider import CircuitBreaker, HTTPNutritionProvider
+
+QUINOA = {"calories": 120, "protein": 4.4, "carbs": 21, "fat": 1.9, "fiber": 2.8, "sugar": 0.9,
+          "vitamins": ["Folate"], "minerals": "Magnesium;Iron", "serving_size": "1 cup"}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        name = parse_qs(urlsplit(self.path).query)['name'][0]
+        self.server.requests.append(name)
+        if name.startswith('slow'):
+            time.sleep(self.server.delay)
+        if name == 'broken' or self.server.failing:
+            status, payload = 500, {}
+        elif 'quinoa' in name or name.startswith('slow'):
+            status, payload = 200, {"foods": [QUINOA]}
+        else:
+            status, payload = 404, {}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    server.delay = 0.5
+    server.failing = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_provider(url, tmp_path, **kwargs):
+    kwargs.setdefault('breaker', CircuitBreaker(failure_threshold=3, reset_seconds=0.2))
+    return HTTPNutritionProvider(url, cache_dir=str(tmp_path), **kwargs)
+
+def stub_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/foods"
+
+def test_found_unknown_and_cached(stub, tmp_path):
+    provider = make_provider(stub_url(stub), tmp_path)
+    record = provider.lookup('quinoa salad')
+    assert record['calories'] == 120.0
+    assert record['minerals'] == ('Magnesium', 'Iron')
+    assert provider.lookup('xyzzy') is None
+
+    provider.lookup('quinoa salad')
+    provider.lookup('xyzzy')
+    assert stub.requests == ['quinoa salad', 'xyzzy']
+
+def test_concurrent_lookups_share_one_request(stub, tmp_path):
+    stub.delay = 0.2
+    provider = make_provider(stub_url(stub), tmp_path, budget=2.0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(provider.lookup('slow quinoa')))
+               for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub.requests == ['slow quinoa']
+    assert len(results) == 20 and all(r['calories'] == 120.0 for r in results)
+
+def test_slow_answer_falls_back_then_fills_cache(stub, tmp_path):
+    stub.delay = 0.5
+    provider = make_provider(stub_url(stub), tmp_path, budget=0.1)
+    started = time.monotonic()
+    assert provider.lookup('slow dish') is None
+    assert time.monotonic() - started < 0.4
+
+    time.sleep(0.6)
+    assert provider.lookup('slow dish')['calories'] == 120.0
+    assert stub.requests == ['slow dish']
+
+def test_breaker_opens_and_closes(stub, tmp_path):
+    provider = make_provider(stub_url(stub), tmp_path)
+    stub.failing = True
+    for _ in range(3):
+        assert provider.lookup('quinoa bowl') is None
+    assert provider.breaker.state == 'open'
+
+    # Open: refused without a request
+    before = len(stub.requests)
+    assert provider.lookup('quinoa bowl') is None
+    assert len(stub.requests) == before
+
+    # After reset_seconds one trial goes out and closes it again
+    stub.failing = False
+    time.sleep(0.25)
+    assert provider.lookup('quinoa bowl')['calories'] == 120.0
+    assert provider.breaker.state == 'closed'
+
+class InlineExecutor:
+    """
+    Runs each task before submit() returns, like a worker that finishes
+    on a fast connection-refused before the caller goes on
+    """
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+def test_finished_request_does_not_deadlock(tmp_path):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    provider = make_provider(f"http://127.0.0.1:{port}/foods", tmp_path,
+                             breaker=CircuitBreaker(failure_threshold=100))
+    provider._executor = InlineExecutor()
+    worker = threading.Thread(target=lambda: [provider.lookup(f'dish {i}') for i in range(3)],
+                              daemon=True)
+    worker.start()
+    worker.join(5)
+    assert not worker.is_alive()
+    assert provider._inflight == {}
@@ -0,0 +1,37 @@
+"""
+Store ingest: bad rows are skipped, and a failed run never replaces the store
+"""
+import os
+
+import pytest
+
+from nutrition_store import NutritionStore, ingest
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+def test_malformed_rows_are_skipped(tmp_path):
+    csv_dump = write(tmp_path / "foods.csv", "name,calories,protein\nsambar,130,6\n")
+    jsonl_dump = write(tmp_path / "more.jsonl",
+                       '{"name": "kheer", "calories": 200}\n{broken\n[1, 2]\n'
+                       '{"name": "halwa", "calories": "x"}\n')
+    output = str(tmp_path / "store.db")
+
+    foods, skipped = ingest([csv_dump, jsonl_dump], output, builtin=False, log=None)
+    assert (foods, skipped) == (2, 3)
+
+    store = NutritionStore(output)
+    assert store.get("sambar")['calories'] == 130
+    assert store.get("kheer")['calories'] == 200
+
+def test_failed_ingest_keeps_previous_store(tmp_path):
+    csv_dump = write(tmp_path / "foods.csv", "name,calories\nsambar,130\n")
+    output = str(tmp_path / "store.db")
+    ingest([csv_dump], output, builtin=False, log=None)
+
+    with pytest.raises(OSError):
+        ingest([csv_dump, str(tmp_path / "missing.csv")], output, builtin=False, log=None)
+
+    assert NutritionStore(output).get("sambar")['calories'] == 130
+    assert not os.path.exists(output + ".tmp")
@@ -0,0 +1,29 @@
+"""
+User Profile Targets
+Daily calorie target from the sidebar profile; pure Python so the first
+page render does not import the analysis stack
+"""
+
+# Maintenance calories per kg of body weight
+ACTIVITY_FACTORS = {
+    "Sedentary": 30,
+    "Moderate": 35,
+    "Active": 40
+}
+
+# Daily surplus or deficit for each goal
+GOAL_ADJUSTMENTS = {
+    "Lose Weight": -500,
+    "Gain Weight": 400,
+    "Maintain Weight": 0
+}
+
+# Never suggest a target below this
+MIN_CALORIE_TARGET = 1200
+
+def daily_calorie_target(weight_kg, user_goal, activity_level):
+    """
+    Daily calorie target from the sidebar profile
+    """
+    maintenance = weight_kg * ACTIVITY_FACTORS.get(activity_level, 30)
+    return max(MIN_CALORIE_TARGET, round(maintenance + GOAL_ADJUSTMENTS.get(user_goal, 0)))